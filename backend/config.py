@@ -22,6 +22,48 @@ ALLOWED_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif"}
 ALLOWED_VIDEO_EXTENSIONS = {".mp4", ".webm", ".ogg"}
 ALLOWED_AUDIO_EXTENSIONS = {".mp3", ".wav", ".ogg"}
 
+# 图片处理配置
+IMAGE_WORKERS = 2  # 图片编码进程数（2 核服务器）
+IMAGE_QUEUE_DEPTH = 40  # 排队（含执行中）的图片任务上限，超过时返回 503
+IMAGE_MAX_EDGE = 2560  # 上传图片长边上限（像素），超过时等比缩小
+IMAGE_VARIANT_WIDTHS = [320, 640, 1280]  # 上传时生成的缩小版本宽度（像素），只生成小于原图宽度的
+# 编码档位：名称 -> 编码参数（format 为 webp 或 avif；webp 使用 quality、method，avif 使用 quality、speed）
+IMAGE_ENCODER_PROFILES = {
+    "fast": {"format": "webp", "quality": 80, "method": 2},  # 编码最快，体积稍大
+    "balanced": {"format": "webp", "quality": 85, "method": 4},
+    "max": {"format": "webp", "quality": 90, "method": 6},  # 压缩最好，编码最慢
+    "avif": {"format": "avif", "quality": 60, "speed": 6},  # 需要 Pillow 支持 AVIF（Pillow 11.2+ 或 pillow-avif-plugin）
+}
+IMAGE_ENCODER_PROFILE = "max"  # 默认编码档位，上传时可用 ?profile= 指定
+IMAGE_GIF_MAX_FRAMES = 300  # GIF 动图转换为 WebP 动图的帧数上限，超过时保留原 GIF
+IMAGE_GIF_MAX_EDGE = 1024  # GIF 动图转换为 WebP 动图的长边上限（像素），超过时保留原 GIF
+IMAGE_JOB_RETENTION = 24 * 3600  # 批量上传任务结束后保留多久（秒）供查询状态
+IMAGE_RESIZE_WIDTHS = {160, 320, 480, 640, 960, 1280, 1920}  # /media/images/{name}?w= 允许的宽度
+IMAGE_RESIZE_QUALITIES = {50, 65, 80, 90}  # /media/images/{name}?q= 允许的质量
+IMAGE_RESIZE_DEFAULT_QUALITY = 80  # 只指定 w 时使用的质量
+IMAGE_RESIZE_CACHE_BYTES = 256 * 1024 * 1024  # 按需缩放结果的磁盘缓存上限（256MB）
+IMAGE_RESIZE_WORKERS = 1  # 按需缩放的编码进程数（与上传分开，匿名请求不占用上传的进程和排队名额）
+IMAGE_RESIZE_QUEUE_DEPTH = 20  # 按需缩放排队（含执行中）的任务上限，超过时返回 503
+
+# 聊天配置
+CHAT_HOT_WINDOW = 100  # 内存中保留的最近消息数量
+CHAT_SEGMENT_SIZE = 500  # 每个归档分段的消息数量
+CHAT_HISTORY_PAGE_SIZE = 50  # 历史消息每页默认数量
+CHAT_COMMIT_WINDOW_MS = 5  # 新消息组提交的最长等待时间（毫秒）
+CHAT_COMMIT_MAX_BATCH = 64  # 攒满该数量的新消息时立即落盘
+CHAT_STREAM_MAX_SUBSCRIBERS = 300  # 推送长连接（SSE）上限，超过时返回 503，页面退回轮询
+
+# 服务器配置
+SERVER_LIMIT_CONCURRENCY = 1000  # uvicorn 同时处理的连接上限；每个打开的聊天页占用一个（长连接空闲时几乎不耗资源）
+
+# 限流配置：接口名 -> (每秒补充的请求数, 允许的突发请求数)
+RATE_LIMITS = {
+    "chat_post": (0.5, 5),  # 发送留言：平均每 2 秒一条，最多连发 5 条
+    "login": (0.2, 5),  # 管理员登录：平均每 5 秒一次
+}
+RATE_LIMIT_MAX_CLIENTS = 10000  # 每个接口最多跟踪的客户端数量
+TRUSTED_PROXIES = {"127.0.0.1", "::1"}  # 采信 X-Real-IP 的反向代理地址
+
 # 应用配置
 APP_NAME = "FrostPage"
 APP_DESCRIPTION = "个人博客网站"
@@ -0,0 +1,147 @@
+"""
+图片编码档位基准测试
+将本地图片目录中的每张图片按每个编码档位走一遍上传转换流程（含缩小版本），
+报告编码耗时、峰值内存和输出大小
+
+用法（在项目根目录执行）：
+    python -m backend.image_benchmark <图片目录> [--profiles fast,balanced,max] [--repeat 3]
+
+每次编码都在独立的子进程中执行，峰值内存（ru_maxrss）互不影响；
+报告的内存增量为编码时的峰值减去子进程导入完成后的基线
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# 项目根目录（子进程以 python -m 方式运行本模块）
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# 参与测试的图片扩展名
+CORPUS_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tiff'}
+
+def max_rss_kb() -> int:
+    """当前进程的峰值内存（KB；macOS 上 ru_maxrss 单位为字节）"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+def run_worker(profile_name: str, source: str) -> Dict[str, Any]:
+    """
+    子进程：按指定档位转换一张图片，输出 JSON 结果
+    """
+    from backend.services.image_processing import convert_to_webp, get_profile
+
+    profile = get_profile(profile_name)
+    baseline = max_rss_kb()
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        result = convert_to_webp(source, os.path.basename(source), output_dir, profile=profile)
+        elapsed = time.perf_counter() - start
+        total_size = sum(path.stat().st_size for path in Path(output_dir).iterdir())
+    peak = max_rss_kb()
+    return {
+        'seconds': elapsed,
+        'peak_rss_kb': peak,
+        'rss_delta_kb': peak - baseline,
+        'original_size': result['original_size'],
+        'size': result['compressed_size'],
+        'total_size': total_size,
+        'format': os.path.splitext(result['filename'])[1][1:],
+    }
+
+def measure(profile_name: str, source: Path) -> Dict[str, Any]:
+    """在独立的子进程中转换一张图片并返回测量结果"""
+    completed = subprocess.run(
+        [sys.executable, '-m', 'backend.image_benchmark', '--worker', profile_name, str(source)],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "子进程异常退出")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def format_size(size: float) -> str:
+    """字节数转为便于阅读的文本"""
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+def benchmark(corpus: Path, profiles: List[str], repeat: int):
+    """对目录中的所有图片逐个档位测试并打印报告"""
+    images = sorted(path for path in corpus.iterdir() if path.suffix.lower() in CORPUS_EXTENSIONS)
+    if not images:
+        print(f"目录中没有图片: {corpus}")
+        return
+
+    print(f"图片 {len(images)} 张，档位 {', '.join(profiles)}，每张重复 {repeat} 次（耗时取最小值）\n")
+    header = f"{'档位':<10}{'图片':<28}{'格式':<6}{'耗时':>9}{'峰值内存':>12}{'内存增量':>12}{'原图':>10}{'输出':>10}{'含缩小版本':>12}"
+    print(header)
+    print('-' * len(header))
+
+    totals: Dict[str, Dict[str, float]] = {}
+    for profile_name in profiles:
+        total = totals.setdefault(profile_name, {'seconds': 0.0, 'peak_rss_kb': 0, 'original_size': 0, 'size': 0, 'total_size': 0})
+        for image in images:
+            try:
+                runs = [measure(profile_name, image) for _ in range(repeat)]
+            except Exception as e:
+                print(f"{profile_name:<10}{image.name[:26]:<28}失败: {e}")
+                continue
+            best = min(runs, key=lambda run: run['seconds'])
+            peak = max(run['peak_rss_kb'] for run in runs)
+            delta = max(run['rss_delta_kb'] for run in runs)
+            print(
+                f"{profile_name:<10}{image.name[:26]:<28}{best['format']:<6}{best['seconds'] * 1000:>7.0f}ms"
+                f"{peak / 1024:>10.1f}MB{delta / 1024:>10.1f}MB{format_size(best['original_size']):>10}"
+                f"{format_size(best['size']):>10}{format_size(best['total_size']):>12}"
+            )
+            total['seconds'] += best['seconds']
+            total['peak_rss_kb'] = max(total['peak_rss_kb'], peak)
+            total['original_size'] += best['original_size']
+            total['size'] += best['size']
+            total['total_size'] += best['total_size']
+
+    print('\n汇总')
+    print('-' * len(header))
+    for profile_name, total in totals.items():
+        ratio = (1 - total['size'] / total['original_size']) * 100 if total['original_size'] else 0.0
+        print(
+            f"{profile_name:<10}总耗时 {total['seconds']:.2f}s  峰值内存 {total['peak_rss_kb'] / 1024:.1f}MB  "
+            f"输出 {format_size(total['size'])}（压缩 {ratio:.1f}%）  含缩小版本 {format_size(total['total_size'])}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description="图片编码档位基准测试")
+    parser.add_argument('corpus', nargs='?', help="图片目录")
+    parser.add_argument('--profiles', help="逗号分隔的档位名称，默认测试当前环境可用的全部档位")
+    parser.add_argument('--repeat', type=int, default=1, help="每张图片每个档位的重复次数（耗时取最小值）")
+    parser.add_argument('--worker', nargs=2, metavar=('PROFILE', 'IMAGE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(*args.worker)))
+        return
+
+    if not args.corpus or not Path(args.corpus).is_dir():
+        parser.error("请指定图片目录")
+
+    from backend.services.image_processing import available_profiles, get_profile
+    profiles = args.profiles.split(',') if args.profiles else available_profiles()
+    for name in profiles:
+        try:
+            get_profile(name)
+        except ValueError as e:
+            parser.error(str(e))
+    benchmark(Path(args.corpus), profiles, max(1, args.repeat))
+
+if __name__ == '__main__':
+    main()
@@ -22,11 +22,7 @@ def init_directories():
     # 1. 创建用户数据目录
     user_dir = ROOT_DIR / "user_data"
     user_dir.mkdir(exist_ok=True)
-    
-    chat_file = user_dir / "chat_messages.json"
-    if not chat_file.exists():
-        with open(chat_file, 'w', encoding='utf-8') as f:
-            json.dump({"messages": []}, f, ensure_ascii=False, indent=2)
+    # 聊天日志 chat_messages.jsonl 由聊天路由首次访问时创建
     
     # 2. 创建管理员数据目录结构
     admin_dir = ROOT_DIR / "admin_data"
@@ -111,8 +107,12 @@ app.mount("/pages", StaticFiles(directory=str(ROOT_DIR / "frontend/pages")), nam
 app.mount("/admin-static", StaticFiles(directory=str(ROOT_DIR / "frontend/admin")), name="admin-static")
 app.mount("/images", StaticFiles(directory=str(ROOT_DIR / "frontend/images")), name="images")
 
+# 上传图片：带 ?w=&q= 时按需缩放（需注册在挂载之前才能优先匹配），不带参数时返回原图
+from backend.routers import media
+app.include_router(media.router, tags=["图片"])
+
 # 挂载管理员数据目录（图片等资源）
-app.mount("/media/images", StaticFiles(directory=str(ROOT_DIR / "admin_data/images")), name="admin-images")
+app.mount("/media/images", media.images_static, name="admin-images")
 
 # 根路由 - 返回首页（SPA入口）
 @app.get("/")
@@ -166,6 +166,21 @@ app.include_router(book.router, prefix="/api/book", tags=["书籍"])
 # 公告路由
 app.include_router(announcement.router, prefix="/api/announcement", tags=["公告"])
 
+# 启动时恢复重启前未处理完的批量上传任务
+from backend.services.image_jobs import image_jobs
+
+@app.on_event("startup")
+async def resume_image_jobs():
+    image_jobs.start()
+
+# 退出前写入图片索引中尚未落盘的修改
+from backend.services.image_index import image_index
+
+@app.on_event("shutdown")
+def flush_image_index():
+    if image_index.loaded:
+        image_index.flush()
+
 def convert_background_to_webp():
     """将背景图片转换为 WebP 格式"""
     from PIL import Image
@@ -252,12 +267,13 @@ if __name__ == "__main__":
     # )
     
     # ========== 生产环境配置（2核2G服务器优化）==========
+    from backend.config import SERVER_LIMIT_CONCURRENCY
     uvicorn.run(
         "main:app",
         host="0.0.0.0",              # 监听所有网络接口
         port=8000,
         log_level="info",            # 显示info级别日志（便于调试）
-        limit_concurrency=200,       # 2核2G服务器的合理并发数
+        limit_concurrency=SERVER_LIMIT_CONCURRENCY,  # 含聊天推送长连接，推送连接数另由 CHAT_STREAM_MAX_SUBSCRIBERS 限制
         timeout_keep_alive=60,       # Keep-Alive超时（节省连接资源）
         access_log=False             # 禁用访问日志（节省I/O）
     )
@@ -2,11 +2,16 @@
 管理员内容管理路由（简化版 - 以草稿为主）
 """
 from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from typing import Any, Dict, Iterable, List, Optional
 from pathlib import Path
 import json
 from datetime import datetime
 from backend.routers.auth import get_current_admin
+from backend.utils.file_storage import invalidate_content_cache, bump_content_version
+from backend.services.content_snapshot import refresh_snapshot
+from backend.services.search_index import search_index
+from backend.services.image_processing import delete_image_files, variant_files
+from backend.services.image_index import image_index, image_filenames, post_key
 
 router = APIRouter()
 
@@ -49,6 +54,34 @@ def write_json(file_path: Path, data: dict):
     with open(file_path, 'w', encoding='utf-8') as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
 
+def release_images(filenames: Iterable[str]):
+    """删除不再被任何文章引用的图片（连同缩小版本）"""
+    for filename in filenames:
+        delete_image_files(IMAGES_DIR, filename)
+        image_index.forget_file(filename)
+
+def sync_post_images(content_type: str, post_id: str, *versions: Optional[dict]):
+    """
+    文章写入后更新图片引用索引，删除不再被任何文章引用的图片
+    :param versions: 文章当前的草稿版本和正文版本（不存在的传 None）
+    """
+    filenames = set()
+    for post in versions:
+        if post:
+            filenames |= image_filenames(post)
+    release_images(image_index.set_post_images(post_key(content_type, post_id), filenames))
+
+def find_post(posts: List[dict], post_id: str) -> Optional[dict]:
+    """按 ID 查找文章"""
+    return next((p for p in posts if p.get('id') == post_id), None)
+
+def on_content_changed(content_type: str):
+    """正文文件写入后调用：使该类型的读缓存失效，重建快照并增量更新搜索索引"""
+    invalidate_content_cache(content_type)
+    bump_content_version()
+    refresh_snapshot(content_type)
+    search_index.sync(content_type)
+
 @router.get("/{content_type}")
 async def get_all_drafts(
     content_type: str,
@@ -93,17 +126,6 @@ async def save_draft(
             existing_index = i
             break
     
-    # 🔥 如果是更新操作，删除被移除的图片
-    if existing_index is not None:
-        old_post = posts[existing_index]
-        old_images = set(old_post.get('images', []))
-        new_images = set(post_data.get('images', []))
-        removed_images = old_images - new_images
-        
-        for img_url in removed_images:
-            filename = img_url.split('/')[-1]
-            (IMAGES_DIR / filename).unlink(missing_ok=True)
-    
     # 更新或添加
     if existing_index is not None:
         posts[existing_index] = post_data
@@ -121,6 +143,13 @@ async def save_draft(
         content_posts = [p for p in content_posts if p.get('id') != post_data['id']]
         content_data['posts'] = content_posts
         write_json(content_path, content_data)
+        on_content_changed(content_type)
+        published_post = None
+    else:
+        published_post = find_post(read_json(content_path).get("posts", []), post_data['id'])
+    
+    # 🔥 更新图片引用索引（正文中的旧版本仍在展示，其图片一并保留），删除不再被任何文章引用的图片
+    sync_post_images(content_type, post_data['id'], post_data, published_post)
     
     return post_data
 
@@ -177,6 +206,10 @@ async def publish_draft(
     
     content_data['posts'] = content_posts
     write_json(content_path, content_data)
+    on_content_changed(content_type)
+    
+    # 草稿和正文版本相同，更新图片引用索引
+    sync_post_images(content_type, post_id, post_to_publish)
     
     return {"success": True, "message": "发布成功"}
 
@@ -215,6 +248,7 @@ async def edit_post(
     content_posts = [p for p in content_posts if p.get('id') != post_id]
     content_data['posts'] = content_posts
     write_json(content_path, content_data)
+    on_content_changed(content_type)
     
     # 更新草稿中的文章状态为 draft（确保状态正确）
     post_to_edit['status'] = 'draft'
@@ -230,6 +264,9 @@ async def edit_post(
     draft_data['posts'] = draft_posts
     write_json(draft_path, draft_data)
     
+    # 正文版本已移除，只保留草稿引用的图片
+    sync_post_images(content_type, post_id, post_to_edit)
+    
     return {"success": True, "message": "已进入编辑模式，文章已从正文中移除"}
 
 @router.delete("/{content_type}/{post_id}")
@@ -248,17 +285,9 @@ async def delete_draft(
     draft_path = get_draft_path(content_type)
     content_path = get_content_path(content_type)
     
-    # 从草稿中删除（先找到文章并删除图片）
+    # 从草稿中删除
     draft_data = read_json(draft_path)
     posts = draft_data.get("posts", [])
-    
-    # 🔥 删除图片文件
-    post_to_delete = next((p for p in posts if p.get('id') == post_id), None)
-    if post_to_delete and post_to_delete.get('images'):
-        for img_url in post_to_delete['images']:
-            filename = img_url.split('/')[-1]
-            (IMAGES_DIR / filename).unlink(missing_ok=True)
-    
     posts = [p for p in posts if p.get('id') != post_id]
     draft_data['posts'] = posts
     write_json(draft_path, draft_data)
@@ -269,123 +298,93 @@ async def delete_draft(
     content_posts = [p for p in content_posts if p.get('id') != post_id]
     content_data['posts'] = content_posts
     write_json(content_path, content_data)
+    on_content_changed(content_type)
+    
+    # 🔥 释放图片引用（其他文章仍在使用的图片保留）
+    sync_post_images(content_type, post_id)
     
     return {"success": True, "message": "删除成功"}
 
+def find_unreferenced_images(verify: bool) -> Dict[str, Any]:
+    """
+    查找未引用图片：图片索引中的原图集合减去被引用的集合（内存计算，不扫描文件）
+    :param verify: 为 True 时先从磁盘和文章文件重建索引，并返回重建前的差异
+    :return: {unreferenced: [{filename, size}], total_images, referenced_images, drift}
+    """
+    drift = image_index.rebuild() if verify else None
+    
+    details = []
+    for filename in sorted(image_index.unreferenced()):
+        # 大小含缩小版本（清理时一并删除）
+        size = 0
+        for path in [IMAGES_DIR / filename] + variant_files(IMAGES_DIR, filename):
+            try:
+                size += path.stat().st_size
+            except FileNotFoundError:
+                pass
+        details.append({"filename": filename, "size": size})
+    
+    return {
+        "unreferenced": details,
+        "total_images": len(image_index.files),
+        "referenced_images": len(image_index.referenced()),
+        "drift": drift
+    }
+
 @router.get("/cleanup/scan")
-async def scan_unreferenced_images(admin: str = Depends(get_current_admin)):
+async def scan_unreferenced_images(verify: bool = False, admin: str = Depends(get_current_admin)):
     """
     扫描未引用图片（不删除）
+    :param verify: 校验模式，先从磁盘和文章文件重建图片索引，返回索引与实际情况的差异
     """
     ensure_dirs()
     
-    # 扫描磁盘所有图片
-    all_images = set()
-    if IMAGES_DIR.exists():
-        for ext in ['*.webp', '*.gif']:
-            for img_file in IMAGES_DIR.glob(ext):
-                all_images.add(img_file.name)
-    
-    # 扫描所有JSON中引用的图片
-    referenced_images = set()
-    
-    # 扫描草稿
-    for content_type in ['research', 'media', 'activity', 'shop', 'announcement']:
-        draft_path = get_draft_path(content_type)
-        draft_data = read_json(draft_path)
-        for post in draft_data.get("posts", []):
-            for img_url in post.get("images", []):
-                filename = img_url.split('/')[-1]
-                referenced_images.add(filename)
-    
-    # 扫描正文
-    for content_type in ['research', 'media', 'activity', 'shop', 'announcement']:
-        content_path = get_content_path(content_type)
-        content_data = read_json(content_path)
-        for post in content_data.get("posts", []):
-            for img_url in post.get("images", []):
-                filename = img_url.split('/')[-1]
-                referenced_images.add(filename)
-    
-    # 计算未引用图片
-    unreferenced = all_images - referenced_images
+    result = find_unreferenced_images(verify)
     
     # 获取详细信息
     unreferenced_details = []
     total_size = 0
-    for filename in unreferenced:
-        file_path = IMAGES_DIR / filename
-        if file_path.exists():
-            size = file_path.stat().st_size
-            total_size += size
-            unreferenced_details.append({
-                "filename": filename,
-                "size": size,
-                "size_mb": round(size / (1024 * 1024), 2)
-            })
+    for item in result["unreferenced"]:
+        total_size += item["size"]
+        unreferenced_details.append({
+            "filename": item["filename"],
+            "size": item["size"],
+            "size_mb": round(item["size"] / (1024 * 1024), 2)
+        })
     
     return {
-        "total_images": len(all_images),
-        "referenced_images": len(referenced_images),
-        "unreferenced_count": len(unreferenced),
+        "total_images": result["total_images"],
+        "referenced_images": result["referenced_images"],
+        "unreferenced_count": len(unreferenced_details),
         "unreferenced_details": unreferenced_details,
         "total_size": total_size,
-        "total_size_mb": round(total_size / (1024 * 1024), 2)
+        "total_size_mb": round(total_size / (1024 * 1024), 2),
+        "index_drift": result["drift"]
     }
 
 @router.post("/cleanup/execute")
-async def cleanup_unreferenced_images(admin: str = Depends(get_current_admin)):
+async def cleanup_unreferenced_images(verify: bool = False, admin: str = Depends(get_current_admin)):
     """
-    执行清理未引用图片
+    执行清理未引用图片（连同缩小版本）
+    :param verify: 校验模式，先从磁盘和文章文件重建图片索引再清理
     """
     ensure_dirs()
     
-    # 扫描磁盘所有图片
-    all_images = set()
-    if IMAGES_DIR.exists():
-        for ext in ['*.webp', '*.gif']:
-            for img_file in IMAGES_DIR.glob(ext):
-                all_images.add(img_file.name)
-    
-    # 扫描所有JSON中引用的图片
-    referenced_images = set()
-    
-    # 扫描草稿
-    for content_type in ['research', 'media', 'activity', 'shop', 'announcement']:
-        draft_path = get_draft_path(content_type)
-        draft_data = read_json(draft_path)
-        for post in draft_data.get("posts", []):
-            for img_url in post.get("images", []):
-                filename = img_url.split('/')[-1]
-                referenced_images.add(filename)
-    
-    # 扫描正文
-    for content_type in ['research', 'media', 'activity', 'shop', 'announcement']:
-        content_path = get_content_path(content_type)
-        content_data = read_json(content_path)
-        for post in content_data.get("posts", []):
-            for img_url in post.get("images", []):
-                filename = img_url.split('/')[-1]
-                referenced_images.add(filename)
-    
-    # 计算未引用图片
-    unreferenced = all_images - referenced_images
+    result = find_unreferenced_images(verify)
     
     # 删除未引用图片
     deleted_count = 0
     freed_space = 0
     
-    for filename in unreferenced:
-        file_path = IMAGES_DIR / filename
-        if file_path.exists():
-            size = file_path.stat().st_size
-            file_path.unlink()
-            deleted_count += 1
-            freed_space += size
+    for item in result["unreferenced"]:
+        freed_space += delete_image_files(IMAGES_DIR, item["filename"])
+        image_index.forget_file(item["filename"])
+        deleted_count += 1
     
     return {
         "success": True,
         "deleted_count": deleted_count,
         "freed_space": freed_space,
-        "freed_space_mb": round(freed_space / (1024 * 1024), 2)
+        "freed_space_mb": round(freed_space / (1024 * 1024), 2),
+        "index_drift": result["drift"]
     }
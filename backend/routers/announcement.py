@@ -1,11 +1,14 @@
 """
 公告管理路由 - 统一草稿系统
 """
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import JSONResponse
 from pathlib import Path
 import json
 from datetime import datetime
 from backend.routers.auth import get_current_admin
+from backend.utils.file_storage import ContentStorage, file_signature
+from backend.utils.http_cache import make_etag, cache_headers, is_not_modified, not_modified_response
 
 router = APIRouter()
 
@@ -44,11 +47,24 @@ def write_json(file_path: Path, data: dict):
         json.dump(data, f, ensure_ascii=False, indent=2)
 
 @router.get("")
-async def get_announcement():
-    """获取已发布的公告（公开接口）"""
+async def get_announcement(request: Request):
+    """
+    获取已发布的公告（公开接口）
+    ETag 由正文文件签名生成，未变化时直接返回 304，不读取文件
+    """
     content_path = get_content_path()
-    data = read_json(content_path)
-    posts = data.get("posts", [])
+    signature = file_signature(content_path)
+    etag = make_etag("announcement", signature)
+    last_modified = signature[0] / 1e9 if signature else None
+    
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    
+    return JSONResponse(build_announcement(), headers=cache_headers(etag, last_modified))
+
+def build_announcement() -> dict:
+    """从正文缓存生成前端期望的公告结构"""
+    posts = ContentStorage("announcement").get_all()
     
     # 只返回已发布的公告
     published = [p for p in posts if p.get('status') == 'published']
@@ -5,14 +5,15 @@ from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from backend.schemas.auth import LoginRequest, TokenResponse
 from backend.utils.auth import verify_admin, create_access_token, verify_token
+from backend.utils.rate_limit import rate_limit
 
 router = APIRouter()
 security = HTTPBearer()
 
-@router.post("/login", response_model=TokenResponse)
+@router.post("/login", response_model=TokenResponse, dependencies=[Depends(rate_limit("login"))])
 async def login(request: LoginRequest):
     """
-    管理员登录
+    管理员登录（按客户端 IP 限流，防止暴力尝试密码）
     """
     if not verify_admin(request.username, request.password):
         raise HTTPException(
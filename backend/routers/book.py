@@ -1,24 +1,36 @@
 """
 书籍内容滚动路由
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse
 from pathlib import Path
+from typing import Dict, Any, List, Tuple
 import os
+from backend.utils.file_storage import file_signature
+from backend.utils.http_cache import make_etag, cache_headers, is_not_modified, not_modified_response
 
 router = APIRouter()
 
 # 书籍文件夹路径
 BOOK_DIR = Path(__file__).parent.parent.parent / "admin_data" / "book"
 
-@router.get("/content")
-async def get_book_content():
+# 上次生成的结果及其对应的书籍文件签名
+_book_cache: Dict[str, Any] = {"signatures": None, "data": None}
+
+def book_signatures() -> List[Tuple[str, Tuple[int, int, int]]]:
+    """获取 book 目录下所有 txt 文件的签名（只 stat，不读取内容）"""
+    signatures = []
+    for file_path in sorted(BOOK_DIR.glob("*.txt")):
+        signature = file_signature(file_path)
+        if signature is not None:
+            signatures.append((file_path.name, signature))
+    return signatures
+
+def read_book_content() -> Dict[str, Any]:
     """
-    获取书籍内容用于滚动显示
+    读取书籍内容
     只返回前100行内容，避免页面卡顿
     """
-    if not BOOK_DIR.exists():
-        return {"content": ""}
-    
     content_lines = []
     max_lines = 100  # 只读取前100行
     
@@ -45,3 +57,27 @@ async def get_book_content():
         "content": " ".join(content_lines) if content_lines else "",
         "total_lines": len(content_lines)
     }
+
+@router.get("/content")
+async def get_book_content(request: Request):
+    """
+    获取书籍内容用于滚动显示
+    ETag 由书籍文件签名生成；文件未变化时返回 304 或直接使用上次结果
+    """
+    if not BOOK_DIR.exists():
+        return {"content": ""}
+    
+    signatures = book_signatures()
+    etag = make_etag("book", signatures)
+    last_modified = max((sig[0] for _, sig in signatures), default=None)
+    if last_modified is not None:
+        last_modified = last_modified / 1e9
+    
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    
+    if _book_cache["signatures"] != signatures:
+        _book_cache["data"] = read_book_content()
+        _book_cache["signatures"] = signatures
+    
+    return JSONResponse(_book_cache["data"], headers=cache_headers(etag, last_modified))
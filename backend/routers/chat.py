@@ -1,20 +1,28 @@
 """
 聊天消息路由
 """
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Dict, Any
-from pathlib import Path
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, Dict, Any, Optional
+import asyncio
 import json
 import uuid
 from datetime import datetime
 from pydantic import BaseModel
 from backend.routers.auth import get_current_admin
+from backend.config import CHAT_HISTORY_PAGE_SIZE, CHAT_STREAM_MAX_SUBSCRIBERS
+from backend.services.chat_hub import chat_hub
+from backend.services.chat_store import chat_store
+from backend.utils.http_cache import make_etag, cache_headers, is_not_modified, not_modified_response
+from backend.utils.rate_limit import rate_limit
 
 router = APIRouter()
 
-# 聊天消息文件路径
-USER_DATA_DIR = Path(__file__).parent.parent.parent / "user_data"
-CHAT_FILE = USER_DATA_DIR / "chat_messages.json"
+# SSE 心跳间隔（秒），防止空闲连接被代理断开
+STREAM_HEARTBEAT_SECONDS = 15
+
+# SSE 连接建立时推送的历史消息数量
+STREAM_INITIAL_MESSAGES = 50
 
 class ChatMessage(BaseModel):
     """聊天消息模型"""
@@ -25,58 +33,119 @@ class ChatMessage(BaseModel):
 class ChatResponse(BaseModel):
     """聊天响应模型"""
     messages: List[Dict[str, Any]]
+    seq: int = 0
+    deleted: List[str] = []
+    reset: bool = False
 
-def read_messages() -> List[Dict[str, Any]]:
-    """读取聊天消息"""
-    if not CHAT_FILE.exists():
-        return []
-    
-    with open(CHAT_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-        return data.get('messages', [])
-
-def write_messages(messages: List[Dict[str, Any]]):
-    """写入聊天消息"""
-    USER_DATA_DIR.mkdir(exist_ok=True)
-    
-    with open(CHAT_FILE, 'w', encoding='utf-8') as f:
-        json.dump({'messages': messages}, f, ensure_ascii=False, indent=2)
+class ChatHistoryResponse(BaseModel):
+    """历史消息响应模型"""
+    messages: List[Dict[str, Any]]
+    next_before: Optional[int] = None
 
 @router.get("/messages", response_model=ChatResponse)
-async def get_messages(limit: int = 50):
+async def get_messages(request: Request, limit: int = 50, since: Optional[int] = None):
     """
     获取聊天消息（支持限制数量）
+    :param since: 上次拿到的 seq；传入时只返回更新的消息和被删除的消息 ID（deleted），
+                  无法增量同步时返回 reset=true 和最近 limit 条消息
+    没有变化时可通过 If-None-Match 得到 304
     """
     try:
-        messages = read_messages()
-        # 限制返回数量
-        if limit > 0:
-            messages = messages[-limit:]
-        return {"messages": messages}
+        chat_store.load()
+        
+        etag = make_etag("chat", chat_store.seq, limit, since)
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+        
+        changes = chat_store.changes_since(since) if since is not None else None
+        if changes is not None:
+            new_messages, deleted = changes
+            body = {"messages": new_messages, "deleted": deleted, "seq": chat_store.seq, "reset": False}
+        else:
+            # 限制返回数量
+            body = {"messages": chat_store.recent(limit), "deleted": [], "seq": chat_store.seq, "reset": since is not None}
+        
+        return JSONResponse(body, headers=cache_headers(etag))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"读取消息失败: {str(e)}")
 
+@router.get("/history", response_model=ChatHistoryResponse)
+async def get_history(before: Optional[int] = None, limit: int = Query(CHAT_HISTORY_PAGE_SIZE, ge=1, le=200)):
+    """
+    向前翻阅历史消息（包括已归档的消息）
+    :param before: 只返回序号小于该值的消息，不传时从最新一条开始；下一页传入上次返回的 next_before
+    """
+    try:
+        messages, next_before = chat_store.history(before, limit)
+        return {"messages": messages, "next_before": next_before}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"读取历史消息失败: {str(e)}")
+
+def format_sse(event: str, data: Any) -> str:
+    """格式化为一条 SSE 事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.get("/stream")
+async def stream_messages(request: Request):
+    """
+    SSE 推送通道
+    连接时推送一次最近消息（init），之后只推送变化：message / delete / clear
+    空闲连接只有心跳，不读磁盘
+    长连接数达到 CHAT_STREAM_MAX_SUBSCRIBERS 时返回 503（页面改用轮询），避免占满服务器的连接数
+    """
+    if chat_hub.subscriber_count >= CHAT_STREAM_MAX_SUBSCRIBERS:
+        raise HTTPException(status_code=503, detail="推送连接数已满，请使用轮询")
+    
+    queue = chat_hub.subscribe()
+    
+    async def event_stream():
+        try:
+            # 订阅早于生成 init，期间发生的变化已包含在 init 中，队列里序号不超过 init_seq 的事件跳过
+            init_seq = chat_store.seq
+            yield format_sse("init", {
+                "messages": chat_store.recent(STREAM_INITIAL_MESSAGES),
+                "seq": init_seq
+            })
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                if item is None:
+                    # 积压过多被广播中心移除，关闭连接让客户端重连
+                    break
+                event, data = item
+                if data.get("seq", init_seq + 1) <= init_seq:
+                    continue
+                yield format_sse(event, data)
+        finally:
+            chat_hub.unsubscribe(queue)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # 关闭 Nginx 代理缓冲，事件才能即时送达
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @router.delete("/messages/{message_id}")
 async def delete_message(message_id: str, admin: str = Depends(get_current_admin)):
     """
     删除单条消息（需要管理员权限）
     """
     try:
-        messages = read_messages()
-        
-        # 查找要删除的消息
-        message_to_delete = None
-        for msg in messages:
-            if msg.get('id') == message_id:
-                message_to_delete = msg
-                break
-        
-        if not message_to_delete:
+        # 删除消息并记录墓碑，增量拉取的客户端据此移除；与新消息一起组提交落盘
+        seq = await chat_store.delete_durable(message_id)
+        if seq is None:
             raise HTTPException(status_code=404, detail="消息不存在")
         
-        # 删除消息
-        messages = [msg for msg in messages if msg.get('id') != message_id]
-        write_messages(messages)
+        chat_hub.publish("delete", {"id": message_id, "seq": seq})
         
         return {"success": True, "message": "消息已删除"}
     except HTTPException:
@@ -90,39 +159,28 @@ async def clear_all_messages(admin: str = Depends(get_current_admin)):
     清空所有消息（需要管理员权限）
     """
     try:
-        write_messages([])
+        seq = await chat_store.clear_durable()
+        chat_hub.publish("clear", {"seq": seq})
         return {"success": True, "message": "所有消息已清空"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"清空消息失败: {str(e)}")
 
-@router.post("/messages")
+@router.post("/messages", dependencies=[Depends(rate_limit("chat_post"))])
 async def send_message(message: ChatMessage):
     """
-    发送新消息
+    发送新消息（按客户端 IP 限流，超过时返回 429）
     """
     try:
-        # 读取现有消息
-        messages = read_messages()
-        
         # 添加时间戳和ID（使用 user 和 text 字段与前端保持一致）
-        new_message = {
+        # 追加一行日志，与同一时间段的其他消息合并为一次 fsync，落盘后才返回
+        new_message = await chat_store.add_durable({
             "id": str(uuid.uuid4()),
             "user": message.user,
             "text": message.text,
             "timestamp": message.timestamp or datetime.now().isoformat()
-        }
-        
-        # 添加到消息列表
-        messages.append(new_message)
-        
-        # 只保留最近100条消息
-        if len(messages) > 100:
-            messages = messages[-100:]
-        
-        # 写入文件
-        write_messages(messages)
+        })
+        chat_hub.publish("message", new_message)
         
         return {"success": True, "message": new_message}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"发送消息失败: {str(e)}")
-
@@ -2,9 +2,12 @@
 配置API路由（公开接口）
 返回前端需要的配置信息
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse
 from pathlib import Path
 import json
+from backend.utils.file_storage import file_signature
+from backend.utils.http_cache import make_etag, cache_headers, is_not_modified, not_modified_response
 
 router = APIRouter()
 
@@ -20,15 +23,23 @@ def read_config() -> dict:
         raise HTTPException(status_code=500, detail=f"读取配置失败: {str(e)}")
 
 @router.get("/stream")
-async def get_stream_config():
+async def get_stream_config(request: Request):
     """
     获取电台流配置（公开接口）
+    ETag 由配置文件签名生成，未变化时直接返回 304
     """
+    signature = file_signature(CONFIG_FILE)
+    etag = make_etag("stream", signature)
+    last_modified = signature[0] / 1e9 if signature else None
+    
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    
     config = read_config()
     stream_config = config.get('stream', {})
     
-    return {
+    return JSONResponse({
         "url": stream_config.get('url', 'https://n10as.radiocult.fm/stream'),
         "name": stream_config.get('name', 'RadioCult.fm')
-    }
+    }, headers=cache_headers(etag, last_modified))
 
@@ -0,0 +1,69 @@
+"""
+上传图片路由
+/media/images/{name} 不带参数时与静态文件服务相同；
+带 w / q 参数时返回按需缩放的 WebP（结果缓存在磁盘）
+"""
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse
+from fastapi.staticfiles import StaticFiles
+from typing import Optional
+from pathlib import Path
+from backend.config import IMAGE_RESIZE_WIDTHS, IMAGE_RESIZE_QUALITIES, IMAGE_RESIZE_DEFAULT_QUALITY
+from backend.services.image_processing import ImageQueueFullError
+from backend.services.image_resize import resize_cache
+from backend.utils.file_storage import file_signature
+from backend.utils.http_cache import make_etag, cache_headers, is_not_modified, not_modified_response
+
+router = APIRouter()
+
+# 上传图片目录
+IMAGES_DIR = Path(__file__).parent.parent.parent / "admin_data" / "images"
+IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+
+# 原图静态文件服务（main.py 中的 /media/images 挂载共用同一个实例）
+images_static = StaticFiles(directory=str(IMAGES_DIR))
+
+@router.get("/media/images/{name}")
+async def get_image(request: Request, name: str, w: Optional[int] = None, q: Optional[int] = None):
+    """
+    获取上传的图片
+    :param w: 缩放到的宽度（只允许 IMAGE_RESIZE_WIDTHS 中的值，不放大）
+    :param q: WebP 质量（只允许 IMAGE_RESIZE_QUALITIES 中的值）
+    """
+    # 不带参数：直接返回原图（含条件请求处理）
+    if w is None and q is None:
+        return await images_static.get_response(name, request.scope)
+    
+    if w is not None and w not in IMAGE_RESIZE_WIDTHS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支持的宽度。允许的宽度: {', '.join(map(str, sorted(IMAGE_RESIZE_WIDTHS)))}"
+        )
+    if q is not None and q not in IMAGE_RESIZE_QUALITIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支持的质量。允许的质量: {', '.join(map(str, sorted(IMAGE_RESIZE_QUALITIES)))}"
+        )
+    
+    source = IMAGES_DIR / name
+    signature = file_signature(source)
+    if signature is None or not source.is_file():
+        raise HTTPException(status_code=404, detail="图片不存在")
+    
+    # 未转换的 GIF 动图原样返回，不缩放
+    if source.suffix.lower() == '.gif':
+        return await images_static.get_response(name, request.scope)
+    
+    etag = make_etag("image", name, w, q, signature)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    
+    try:
+        path = await resize_cache.get(source, w, q or IMAGE_RESIZE_DEFAULT_QUALITY)
+    except ImageQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        print(f"缩放图片失败: {e}")
+        raise HTTPException(status_code=500, detail=f"缩放图片失败: {str(e)}")
+    
+    return FileResponse(path, media_type="image/webp", headers=cache_headers(etag))
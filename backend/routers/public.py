@@ -1,26 +1,113 @@
 """
 公开API路由（无需认证）
 """
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
+from typing import List, Optional
 from backend.schemas.content import ContentResponse
-from backend.utils.file_storage import ContentStorage
+from backend.services.content_snapshot import get_snapshot
+from backend.utils.http_cache import make_etag, cache_headers, is_not_modified, not_modified_response
 
 router = APIRouter()
 
+# 只传 cursor 未传 limit 时的默认每页数量
+DEFAULT_PAGE_SIZE = 20
+
 @router.get("/{content_type}", response_model=List[ContentResponse])
-async def get_public_content(content_type: str):
+async def get_public_content(
+    content_type: str,
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, pattern="^summary$"),
+    include: Optional[str] = Query(None, pattern="^image_meta$")
+):
     """
     获取公开发布的内容（只返回已发布的内容）
+    不带参数时直接返回发布时物化好的 JSON 字节（按 Accept-Encoding 选择压缩版本）
+    支持 If-None-Match / If-Modified-Since，未变化时返回 304
+    :param limit: 每页数量；指定 limit 或 cursor 时返回 {"items": [...], "next_cursor": ...}
+    :param cursor: 上一页返回的 next_cursor
+    :param fields: summary 时只返回 id、标题、摘录、首图（含宽高、主色调和占位图）和创建时间
+    :param include: image_meta 时完整文章附加 image_meta（图片 URL -> {width, height, color, placeholder}）
     """
     if content_type not in ['research', 'media', 'activity', 'shop', 'announcement']:
         raise HTTPException(status_code=400, detail="无效的内容类型")
     
-    storage = ContentStorage(content_type)
-    all_posts = storage.get_all()
+    snapshot = get_snapshot(content_type)
+    
+    if limit is None and cursor is None and fields is None and include is None:
+        return snapshot_response(request, snapshot)
+    
+    # 摘要（含 srcset）和 image_meta 不只取决于正文：ETag 包含它们的哈希，
+    # 也不提供 Last-Modified（正文文件的修改时间不能反映图片元数据的变化）
+    with_image_data = fields is not None or include is not None
+    image_meta_hash = snapshot.image_meta_hash if with_image_data else None
+    last_modified = None if with_image_data else snapshot.last_modified
+    etag = make_etag(snapshot.etag, limit, cursor, fields, include, image_meta_hash)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    
+    summary = fields == "summary"
+    include_image_meta = include == "image_meta"
+    headers = cache_headers(etag, last_modified)
+    
+    if limit is None and cursor is None:
+        if summary:
+            return JSONResponse(snapshot.summaries, headers=headers)
+        return JSONResponse(snapshot.with_image_meta(snapshot.posts), headers=headers)
+    
+    try:
+        items, next_cursor = snapshot.page(cursor, limit or DEFAULT_PAGE_SIZE, summary, include_image_meta)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return JSONResponse({"items": items, "next_cursor": next_cursor}, headers=headers)
+
+@router.get("/{content_type}/{post_id}", response_model=ContentResponse)
+async def get_public_post(
+    content_type: str,
+    post_id: str,
+    request: Request,
+    include: Optional[str] = Query(None, pattern="^image_meta$")
+):
+    """
+    获取单篇已发布文章（通过 id 索引查找，无需下载整个列表）
+    :param include: image_meta 时附加 image_meta（图片 URL -> {width, height, color, placeholder}）
+    """
+    if content_type not in ['research', 'media', 'activity', 'shop', 'announcement']:
+        raise HTTPException(status_code=400, detail="无效的内容类型")
+    
+    snapshot = get_snapshot(content_type)
+    result = snapshot.post_body(post_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="文章不存在")
+    
+    body, etag = result
+    last_modified = snapshot.last_modified
+    if include is not None:
+        # image_meta 不只取决于正文，同列表接口
+        etag = make_etag(etag, include, snapshot.post_image_meta_hash(post_id))
+        last_modified = None
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    
+    if include is not None:
+        return JSONResponse(snapshot.post_with_image_meta(post_id), headers=cache_headers(etag, last_modified))
+    
+    return Response(content=body, media_type="application/json", headers=cache_headers(etag, last_modified))
+
+def snapshot_response(request: Request, snapshot) -> Response:
+    """返回完整列表的预序列化字节"""
+    body, encoding = snapshot.encoded_body(request.headers.get('accept-encoding', ''))
+    etag = snapshot.etag_for(encoding)
     
-    # 只返回已发布的内容，按创建时间倒序
-    published_posts = [p for p in all_posts if p.get('status') == 'published']
-    published_posts.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+    if is_not_modified(request, etag, snapshot.last_modified):
+        response = not_modified_response(etag, snapshot.last_modified)
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
     
-    return published_posts
+    headers = {"Vary": "Accept-Encoding", **cache_headers(etag, snapshot.last_modified)}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,84 +1,112 @@
 """
-搜索路由 - 直接从 admin_data 读取并搜索
+搜索路由 - 通过倒排索引查找并按 BM25 排序，返回摘要片段而不是全文
+相同查询的结果缓存在 LRU 中，正文版本变化时整体失效
 """
-from fastapi import APIRouter, Query
-from typing import List, Dict, Any
+from fastapi import APIRouter, Query, Response
+from typing import Dict, Any, List
 import json
-from pathlib import Path
+from backend.services.search_index import search_index, tokenize_query, SEARCH_TYPES
+from backend.utils.file_storage import ContentStorage, get_content_version
+from backend.utils.lru_cache import LRUCache
 
 router = APIRouter()
 
-# admin_data 目录路径
-ADMIN_DATA_DIR = Path(__file__).parent.parent.parent / "admin_data"
-PUBLISHED_DIR = ADMIN_DATA_DIR / "published"
+# 摘要片段长度（字符数）
+SNIPPET_LENGTH = 120
+
+# 查询结果缓存：最多 256 条、共 4MB
+result_cache = LRUCache(max_entries=256, max_bytes=4 * 1024 * 1024)
+
+def normalize_query(q: str) -> str:
+    """规范化查询：转小写并合并空白"""
+    return ' '.join(q.lower().split())
+
+def make_snippet(content: str, keyword: str) -> str:
+    """
+    截取正文中命中位置附近的片段
+    优先定位完整关键词，其次定位第一个命中的查询词项，都没有时取开头
+    """
+    lowered = content.lower()
+    position = lowered.find(keyword)
+    if position < 0:
+        for term, _ in tokenize_query(keyword):
+            position = lowered.find(term)
+            if position >= 0:
+                break
+    if position < 0:
+        position = 0
+    
+    start = max(0, position - SNIPPET_LENGTH // 3)
+    end = min(len(content), start + SNIPPET_LENGTH)
+    start = max(0, end - SNIPPET_LENGTH)
+    
+    snippet = content[start:end].replace('\n', ' ')
+    if start > 0:
+        snippet = '...' + snippet
+    if end < len(content):
+        snippet = snippet + '...'
+    return snippet
 
 @router.get("/search")
-async def search_content(q: str = Query(..., min_length=1)):
+async def search_content(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
     """
     全局搜索 - 搜索所有已发布内容
     :param q: 搜索关键词
+    :param limit: 返回数量
+    :param offset: 跳过前 offset 条（分页）
     """
-    keyword = q.lower()
-    results = {
-        'research': [],
-        'media': [],
-        'activity': [],
-        'shop': [],
-        'total': 0
-    }
+    keyword = normalize_query(q)
     
-    # 搜索所有类型
-    content_types = ['research', 'media', 'activity', 'shop']
+    # 正文有变化的类型先增量更新索引
+    search_index.ensure_fresh()
     
-    for content_type in content_types:
-        file_path = PUBLISHED_DIR / f"{content_type}.json"
-        
-        if not file_path.exists():
+    cache_key = (keyword, limit, offset)
+    version = (get_content_version(), search_index.generation)
+    cached = result_cache.get(cache_key, version)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    
+    total, hits = search_index.search(keyword, limit, offset)
+    storages = {t: ContentStorage(t) for t in SEARCH_TYPES}
+    
+    results: List[Dict[str, Any]] = []
+    for score, key in hits:
+        doc = search_index.doc(key)
+        if doc is None:
             continue
-        
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                posts = data.get('posts', [])
-                
-                # 过滤匹配的内容
-                for post in posts:
-                    # 只搜索已发布的内容
-                    if post.get('status') != 'published':
-                        continue
-                    
-                    title = (post.get('title') or '').lower()
-                    content = (post.get('content') or '').lower()
-                    
-                    # 模糊匹配
-                    if keyword in title or keyword in content:
-                        # 计算相关度
-                        relevance = 0
-                        if keyword in title:
-                            relevance += 10
-                        if keyword in content:
-                            relevance += 1
-                        
-                        # 添加类型和相关度
-                        post_with_meta = {
-                            **post,
-                            'type': content_type,
-                            'relevance': relevance
-                        }
-                        results[content_type].append(post_with_meta)
-        
-        except Exception as e:
-            print(f"搜索 {content_type} 失败: {e}")
+        post = storages[doc['type']].get_by_id(doc['id'])
+        if post is None:
             continue
+        
+        images = post.get('images') or []
+        results.append({
+            'id': post.get('id'),
+            'type': doc['type'],
+            'title': post.get('title'),
+            'snippet': make_snippet(post.get('content') or '', keyword),
+            'image': images[0] if images else None,
+            'created_at': post.get('created_at'),
+            'relevance': round(score, 4)
+        })
     
-    # 计算总数
-    results['total'] = sum(len(results[t]) for t in content_types)
-    
-    # 对每个类型的结果按相关度和时间排序
-    for content_type in content_types:
-        results[content_type].sort(
-            key=lambda x: (-x.get('relevance', 0), x.get('created_at', '')),
-            reverse=True
-        )
+    body = json.dumps({
+        'query': keyword,
+        'total': total,
+        'limit': limit,
+        'offset': offset,
+        'results': results
+    }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    result_cache.put(cache_key, body, version)
     
-    return results
+    return Response(content=body, media_type="application/json")
+
+@router.get("/search/stats")
+async def search_cache_stats():
+    """
+    搜索结果缓存统计（命中/未命中次数、条目数、占用字节）
+    """
+    return result_cache.stats()
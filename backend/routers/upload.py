@@ -1,97 +1,99 @@
 """
 文件上传路由
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
 import os
-import uuid
+import tempfile
 from pathlib import Path
-from PIL import Image
-import io
+from backend.config import MAX_UPLOAD_SIZE
 from backend.routers.auth import get_current_admin
+from backend.services.image_processing import ImageQueueFullError, delete_image_files, get_file_extension, get_profile
+from backend.services.image_index import image_index
+from backend.services.image_jobs import image_jobs
+from backend.services.image_upload import IMAGES_DIR, build_upload_result, convert_saved_upload
 
 router = APIRouter()
 
-# 管理员数据目录（统一存储所有管理员数据）
-ADMIN_DATA_DIR = Path(__file__).parent.parent.parent / "admin_data"
-IMAGES_DIR = ADMIN_DATA_DIR / "images"
-
 # 确保目录存在
 IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+image_jobs.spool_dir.mkdir(parents=True, exist_ok=True)
 
 # 允许的图片格式（输入）
 ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tiff'}
 
-# WebP 压缩质量（0-100，推荐85-95）
-WEBP_QUALITY = 90
-
-def get_file_extension(filename: str) -> str:
-    """获取文件扩展名"""
-    return os.path.splitext(filename)[1].lower()
+# 上传文件分块读取的大小
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 def is_allowed_file(filename: str) -> bool:
     """检查文件类型是否允许"""
     return get_file_extension(filename) in ALLOWED_EXTENSIONS
 
-def convert_to_webp(image_data: bytes, original_filename: str) -> tuple:
+async def save_upload_to_temp(file: UploadFile, directory: Optional[Path] = None) -> Tuple[Path, str]:
     """
-    将图片转换为WebP格式（GIF除外）
-    返回: (webp_data, new_filename, original_size, compressed_size, compression_ratio)
+    将上传文件分块写入临时文件，不把整个文件读入内存，同时计算内容哈希
+    累计大小超过 MAX_UPLOAD_SIZE 时立即中止（413）
+    :param directory: 临时文件所在目录，默认为系统临时目录
+    返回: (临时文件路径, SHA-256)
     """
+    fd, tmp_path = tempfile.mkstemp(suffix=get_file_extension(file.filename), dir=directory)
+    digest = hashlib.sha256()
+    size = 0
     try:
-        # 如果是GIF，直接保存不转换
-        if get_file_extension(original_filename) == '.gif':
-            new_filename = f"{uuid.uuid4().hex}.gif"
-            original_size = len(image_data)
-            return image_data, new_filename, original_size, original_size, 0.0
-        
-        # 打开图片
-        image = Image.open(io.BytesIO(image_data))
-        
-        # 如果是RGBA模式（PNG透明），保持透明度
-        if image.mode == 'RGBA':
-            pass
-        # 如果是调色板模式，转换为RGB
-        elif image.mode == 'P':
-            image = image.convert('RGBA')
-        # 其他模式转为RGB
-        elif image.mode not in ('RGB', 'RGBA'):
-            image = image.convert('RGB')
-        
-        # 生成新文件名（使用UUID + .webp）
-        new_filename = f"{uuid.uuid4().hex}.webp"
-        
-        # 转换为WebP
-        output = io.BytesIO()
-        image.save(
-            output, 
-            format='WEBP',
-            quality=WEBP_QUALITY,
-            method=6  # 压缩方法（0-6，6最慢但压缩最好）
-        )
-        webp_data = output.getvalue()
-        
-        # 获取原始和压缩后的大小
-        original_size = len(image_data)
-        compressed_size = len(webp_data)
-        compression_ratio = (1 - compressed_size / original_size) * 100
-        
-        return webp_data, new_filename, original_size, compressed_size, compression_ratio
-        
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_SIZE:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"文件过大，最大允许 {MAX_UPLOAD_SIZE // (1024 * 1024)}MB"
+                    )
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return Path(tmp_path), digest.hexdigest()
+
+def resolve_profile(name: Optional[str]) -> Dict[str, Any]:
+    """获取编码档位参数（档位不存在或不可用时返回 400）"""
+    try:
+        return get_profile(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def convert_upload(file: UploadFile, profile: Dict[str, Any]) -> dict:
+    """
+    保存上传文件并在进程池中按编码档位转换为WebP或AVIF格式（GIF 动图转换为 WebP 动图），结果直接写入图片目录
+    返回: image_upload.convert_saved_upload 的结果
+    """
+    tmp_path, digest = await save_upload_to_temp(file)
+    try:
+        return await convert_saved_upload(tmp_path, digest, file.filename, profile)
+    except ImageQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=400,
             detail=f"图片处理失败: {str(e)}"
         )
+    finally:
+        tmp_path.unlink(missing_ok=True)
 
 @router.post("/image")
 async def upload_image(
     file: UploadFile = File(...),
+    profile: Optional[str] = Query(None),
     admin: str = Depends(get_current_admin)
 ):
     """
-    上传单张图片（自动转换为WebP）
+    上传单张图片（自动转换为WebP，并生成缩小版本）
     需要管理员权限
+    :param profile: 编码档位（fast / balanced / max / avif），默认使用 config.IMAGE_ENCODER_PROFILE
     """
     # 检查文件类型
     if not is_allowed_file(file.filename):
@@ -100,42 +102,27 @@ async def upload_image(
             detail=f"不支持的文件类型。允许的类型: {', '.join(ALLOWED_EXTENSIONS)}"
         )
     
-    # 读取文件内容
-    content = await file.read()
-    
-    # 转换为WebP
-    webp_data, new_filename, original_size, compressed_size, compression_ratio = convert_to_webp(
-        content, 
-        file.filename
-    )
-    
-    # 保存文件
-    file_path = IMAGES_DIR / new_filename
-    with open(file_path, 'wb') as f:
-        f.write(webp_data)
+    encoder_profile = resolve_profile(profile)
     
-    # 返回图片 URL
-    image_url = f"/media/images/{new_filename}"
+    # 分块保存后转换为WebP并生成缩小版本（在进程池中执行，不阻塞其他请求）
+    result = await convert_upload(file, encoder_profile)
     
     return {
         "success": True,
-        "url": image_url,
-        "filename": new_filename,
-        "original_filename": file.filename,
-        "original_size": original_size,
-        "compressed_size": compressed_size,
-        "compression_ratio": f"{compression_ratio:.1f}%",
-        "format": "webp"
+        **build_upload_result(result, file.filename)
     }
 
 @router.post("/images")
 async def upload_images(
     files: List[UploadFile] = File(...),
+    profile: Optional[str] = Query(None),
     admin: str = Depends(get_current_admin)
 ):
     """
     批量上传图片（自动转换为WebP）
+    文件保存后立即返回任务 ID，编码在后台任务队列中进行，通过 GET /jobs/{job_id} 查询进度和结果
     需要管理员权限
+    :param profile: 编码档位（fast / balanced / max / avif），默认使用 config.IMAGE_ENCODER_PROFILE
     """
     if len(files) > 20:
         raise HTTPException(
@@ -143,11 +130,15 @@ async def upload_images(
             detail="一次最多上传 20 张图片"
         )
     
-    uploaded_images = []
+    resolve_profile(profile)
+    # 先加载任务队列（加载时会清理暂存目录中的残留文件）
+    image_jobs.load()
+    
     errors = []
+    uploads = []
     
-    for file in files:
-        try:
+    try:
+        for file in files:
             # 检查文件类型
             if not is_allowed_file(file.filename):
                 errors.append({
@@ -156,53 +147,55 @@ async def upload_images(
                 })
                 continue
             
-            # 读取文件内容
-            content = await file.read()
-            
-            # 转换为WebP
-            webp_data, new_filename, original_size, compressed_size, compression_ratio = convert_to_webp(
-                content,
-                file.filename
-            )
-            
-            # 保存文件
-            file_path = IMAGES_DIR / new_filename
-            with open(file_path, 'wb') as f:
-                f.write(webp_data)
-            
-            # 添加到成功列表
-            uploaded_images.append({
-                "url": f"/media/images/{new_filename}",
-                "filename": new_filename,
-                "original_filename": file.filename,
-                "original_size": original_size,
-                "compressed_size": compressed_size,
-                "compression_ratio": f"{compression_ratio:.1f}%",
-                "format": "webp"
-            })
-            
-        except Exception as e:
-            errors.append({
-                "filename": file.filename,
-                "error": str(e)
-            })
+            # 分块保存到任务暂存目录（编码由任务队列完成）
+            try:
+                tmp_path, digest = await save_upload_to_temp(file, image_jobs.spool_dir)
+            except HTTPException as e:
+                errors.append({
+                    "filename": file.filename,
+                    "error": e.detail
+                })
+                continue
+            uploads.append((tmp_path, digest, file.filename))
+        
+        job = image_jobs.submit(uploads, profile) if uploads else None
+    except BaseException:
+        for tmp_path, _, _ in uploads:
+            tmp_path.unlink(missing_ok=True)
+        raise
     
     return {
-        "success": len(uploaded_images) > 0,
-        "uploaded": uploaded_images,
+        "success": job is not None,
+        "job_id": job['job_id'] if job else None,
+        "status_url": f"/api/upload/jobs/{job['job_id']}" if job else None,
         "errors": errors,
         "total": len(files),
-        "success_count": len(uploaded_images),
+        "accepted_count": len(uploads),
         "error_count": len(errors)
     }
 
+@router.get("/jobs/{job_id}")
+async def get_upload_job(
+    job_id: str,
+    admin: str = Depends(get_current_admin)
+):
+    """
+    查询批量上传任务的进度
+    每张图片的状态为 pending / processing / done / failed，完成的图片附带上传结果（URL 等）
+    需要管理员权限
+    """
+    job = image_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在或已过期")
+    return job
+
 @router.delete("/image/{filename}")
 async def delete_image(
     filename: str,
     admin: str = Depends(get_current_admin)
 ):
     """
-    删除图片
+    删除图片（仅限未被文章引用的图片）
     需要管理员权限
     """
     file_path = IMAGES_DIR / filename
@@ -214,8 +207,13 @@ async def delete_image(
     if not str(file_path.resolve()).startswith(str(IMAGES_DIR.resolve())):
         raise HTTPException(status_code=403, detail="无效的文件路径")
     
-    # 删除文件
-    file_path.unlink()
+    # 相同内容的图片只保存一份，仍被文章引用时不能删除
+    if image_index.ref_count(filename) > 0:
+        raise HTTPException(status_code=409, detail="图片仍被文章引用，无法删除")
+    
+    # 删除文件（连同缩小版本）
+    delete_image_files(IMAGES_DIR, filename)
+    image_index.forget_file(filename)
     
     return {
         "success": True,
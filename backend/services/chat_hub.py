@@ -0,0 +1,46 @@
+"""
+聊天广播中心（进程内）
+每个 SSE 连接订阅一个队列，发送/删除消息时向所有订阅者推送事件
+"""
+import asyncio
+from typing import Any, Set
+
+# 单个订阅者最多积压的事件数，超过说明客户端过慢，断开让其重连
+SUBSCRIBER_QUEUE_SIZE = 100
+
+class ChatHub:
+    """广播中心：publish 一次，所有订阅者各收到一份"""
+
+    def __init__(self):
+        self.subscribers: Set[asyncio.Queue] = set()
+
+    def subscribe(self) -> asyncio.Queue:
+        """新增订阅者"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        """移除订阅者"""
+        self.subscribers.discard(queue)
+
+    def publish(self, event: str, data: Any):
+        """
+        推送事件（不阻塞）
+        积压已满的订阅者会收到 None 并被移除，对应连接随后关闭
+        """
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                self.subscribers.discard(queue)
+                # 腾出一个位置放入结束标记
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self.subscribers)
+
+# 进程级实例
+chat_hub = ChatHub()
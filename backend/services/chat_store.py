@@ -0,0 +1,558 @@
+"""
+聊天消息存储引擎
+- 最近 CHAT_HOT_WINDOW 条消息保存在内存（热窗口），是实时读取的唯一来源
+- 所有变化追加写入 JSONL 日志，按批次组提交（一批一次 fsync），日志过长时在后台压缩
+- 滑出热窗口的消息累计满 CHAT_SEGMENT_SIZE 条后在后台线程封存为 gzip 压缩的只读归档分段，
+  分段的序号范围记录在索引中，翻阅历史时只读取需要的那一个分段
+- 分段封存后不再改写，删除其中的消息只在日志中记录序号，读取分段时过滤
+"""
+import asyncio
+import gzip
+import json
+import os
+import threading
+from bisect import bisect_left
+from collections import deque
+from functools import lru_cache
+from typing import Callable, List, Dict, Any, Optional, Set, Tuple
+from backend.config import CHAT_HOT_WINDOW, CHAT_SEGMENT_SIZE, CHAT_COMMIT_WINDOW_MS, CHAT_COMMIT_MAX_BATCH
+from backend.utils.file_storage import USER_DATA_DIR
+
+# 聊天日志文件（CHAT_FILE 为旧版整文件格式，仅用于迁移）
+CHAT_FILE = USER_DATA_DIR / "chat_messages.json"
+CHAT_LOG_FILE = USER_DATA_DIR / "chat_messages.jsonl"
+
+# 归档分段目录及索引
+ARCHIVE_DIR = USER_DATA_DIR / "chat_archive"
+ARCHIVE_INDEX_FILE = ARCHIVE_DIR / "index.json"
+
+# 日志行数超过该值时后台压缩
+COMPACT_THRESHOLD = 1000
+
+# 内存中保留的删除记录（墓碑）数量
+MAX_TOMBSTONES = 500
+
+# 解压后的归档分段缓存数量（分段只读，缓存无需失效）
+SEGMENT_CACHE_SIZE = 8
+
+def _write_atomic(path, data: bytes, tmp_suffix: str = '.tmp'):
+    """先写临时文件再原子替换"""
+    tmp_path = path.with_suffix(path.suffix + tmp_suffix)
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+@lru_cache(maxsize=SEGMENT_CACHE_SIZE)
+def _read_segment(file_name: str) -> Tuple[Dict[str, Any], ...]:
+    """读取并解压一个归档分段（按序号升序）"""
+    with gzip.open(ARCHIVE_DIR / file_name, 'rt', encoding='utf-8') as f:
+        return tuple(json.load(f))
+
+class GroupCommitter:
+    """
+    组提交：把一段时间内的多次写入合并为一次 fsync
+    第一个等待者到达后最多等待 CHAT_COMMIT_WINDOW_MS，或攒满 CHAT_COMMIT_MAX_BATCH 个时立即落盘；
+    落盘进行中到达的等待者归入下一批
+    """
+
+    def __init__(self, sync: Callable[[], None],
+                 window_ms: float = CHAT_COMMIT_WINDOW_MS, max_batch: int = CHAT_COMMIT_MAX_BATCH):
+        self.sync = sync
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._waiters: List[asyncio.Future] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushing = False
+        # 统计：落盘批次数和提交的写入数
+        self.batches = 0
+        self.commits = 0
+
+    async def wait(self):
+        """等待之前追加的记录落盘（需在追加之后、不经过 await 立即调用）"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiters.append(future)
+        if len(self._waiters) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._start_flush)
+        await future
+
+    def _start_flush(self):
+        """取走当前批次并在线程中落盘"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flushing or not self._waiters:
+            return
+        self._flushing = True
+        batch, self._waiters = self._waiters, []
+        asyncio.get_running_loop().create_task(self._flush(batch))
+
+    async def _flush(self, batch: List[asyncio.Future]):
+        try:
+            await asyncio.to_thread(self.sync)
+        except Exception as e:
+            print(f"聊天日志落盘失败: {e}")
+            for future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            self.batches += 1
+            self.commits += len(batch)
+            for future in batch:
+                if not future.done():
+                    future.set_result(None)
+        finally:
+            self._flushing = False
+            # 落盘期间到达的等待者：已攒满则立即落盘，否则按窗口计时
+            if len(self._waiters) >= self.max_batch:
+                self._start_flush()
+            elif self._waiters and self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.window, self._start_flush)
+
+class ChatStore:
+    """
+    聊天消息存储
+    每次变化分配递增序号 seq，供增量拉取和历史分页使用
+    """
+
+    def __init__(self, hot_window: int = CHAT_HOT_WINDOW, segment_size: int = CHAT_SEGMENT_SIZE):
+        self.hot_window = hot_window
+        self.segment_size = segment_size
+        self.loaded = False
+        self.lock = threading.Lock()
+        # 热窗口
+        self.messages: deque = deque(maxlen=hot_window)
+        # 已滑出热窗口、尚未封存的消息（仍记录在日志中）
+        self.overflow: List[Dict[str, Any]] = []
+        # 归档分段索引：[{file, first_seq, last_seq, count}]，按序号升序
+        self.segments: List[Dict[str, Any]] = []
+        # 已封存后又被删除的消息序号
+        self.archived_deleted: Set[int] = set()
+        self.seq = 0
+        # 删除记录：(seq, message_id)
+        self.tombstones: deque = deque()
+        # since 小于该序号的客户端可能错过了删除或清空，需要全量刷新
+        self.reset_seq = 0
+        # 日志追加句柄和当前日志行数
+        self._log = None
+        self._log_records = 0
+        self._compacting = False
+        self._sealing = False
+        # 每次清空递增，后台封存据此判断写出的分段是否已作废
+        self._clear_epoch = 0
+        # 新消息、删除和清空的批量落盘
+        self.committer = GroupCommitter(self.sync)
+
+    # ========== 加载 ==========
+
+    def load(self):
+        """加载归档索引并回放日志（只执行一次）；没有日志时从旧版 JSON 文件迁移"""
+        if self.loaded:
+            return
+        with self.lock:
+            if self.loaded:
+                return
+            USER_DATA_DIR.mkdir(exist_ok=True)
+            self._load_index()
+            if CHAT_LOG_FILE.exists():
+                self._replay()
+            elif CHAT_FILE.exists():
+                self._migrate_json()
+            # 重启后删除记录已丢失，之前的客户端一律全量刷新
+            self.reset_seq = self.seq
+            self._log = open(CHAT_LOG_FILE, 'a', encoding='utf-8')
+            self.loaded = True
+
+    def _load_index(self):
+        """读取归档索引"""
+        if not ARCHIVE_INDEX_FILE.exists():
+            return
+        with open(ARCHIVE_INDEX_FILE, 'r', encoding='utf-8') as f:
+            self.segments = json.load(f).get('segments', [])
+        if self.segments:
+            self.seq = self.segments[-1]['last_seq']
+
+    def _replay(self):
+        """逐行回放日志；末尾不完整的行（写入中断）直接忽略"""
+        records = 0
+        with open(CHAT_LOG_FILE, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records += 1
+                self._apply(record)
+        self._log_records = records
+
+    def _migrate_json(self):
+        """将旧版 chat_messages.json 转为 JSONL 日志"""
+        with open(CHAT_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.seq = max(self.seq, data.get('seq', 0))
+        for msg in data.get('messages', []):
+            # 旧数据没有序号，按顺序补齐
+            if 'seq' not in msg:
+                self.seq += 1
+                msg['seq'] = self.seq
+            self._push(msg)
+        self._write_snapshot()
+
+    def _apply(self, record: Dict[str, Any]):
+        """将一条日志记录应用到内存状态"""
+        op = record.get('op')
+        if op == 'add':
+            self._push(record['msg'])
+        elif op == 'del':
+            self._remove(record['id'])
+        elif op == 'del_archived':
+            self.archived_deleted.update(record['seqs'])
+        elif op == 'clear':
+            self.messages.clear()
+            self.overflow.clear()
+            # 清空之后封存的分段保留
+            self._drop_archive(record['seq'])
+        self.seq = max(self.seq, record.get('seq') or record.get('msg', {}).get('seq', 0))
+
+    # ========== 热窗口与归档 ==========
+
+    @property
+    def archived_seq(self) -> int:
+        """已封存的最大序号"""
+        return self.segments[-1]['last_seq'] if self.segments else 0
+
+    def _push(self, msg: Dict[str, Any]):
+        """消息加入热窗口，挤出的最旧消息转入待归档区，满一个分段时封存（加载完成后在后台线程进行）"""
+        if msg['seq'] <= self.archived_seq:
+            # 回放压缩前的日志时，已封存的消息直接跳过
+            return
+        if len(self.messages) == self.hot_window:
+            self.overflow.append(self.messages.popleft())
+        self.messages.append(msg)
+        if len(self.overflow) >= self.segment_size:
+            if not self.loaded:
+                self._seal()
+            elif not self._sealing:
+                self._sealing = True
+                threading.Thread(target=self._seal_background, daemon=True).start()
+
+    def _write_segment(self, batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """将一批消息写成 gzip 分段文件（不持有锁），返回分段索引项"""
+        first_seq = batch[0]['seq']
+        file_name = f"segment_{first_seq:010d}.json.gz"
+        ARCHIVE_DIR.mkdir(exist_ok=True)
+        raw = json.dumps(batch, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        _write_atomic(ARCHIVE_DIR / file_name, gzip.compress(raw, compresslevel=9, mtime=0))
+        return {
+            'file': file_name,
+            'first_seq': first_seq,
+            'last_seq': batch[-1]['seq'],
+            'count': len(batch),
+        }
+
+    @staticmethod
+    def _write_index(segments: List[Dict[str, Any]], tmp_suffix: str = '.tmp'):
+        """写入归档索引（后台封存使用单独的临时文件，避免与清空同时写入同一个临时文件）"""
+        data = json.dumps({'segments': segments}, ensure_ascii=False).encode('utf-8')
+        _write_atomic(ARCHIVE_INDEX_FILE, data, tmp_suffix)
+
+    def _seal(self):
+        """将待归档区封存为一个只读分段（先写分段再更新索引；加载时使用，需持有锁）"""
+        batch = self.overflow[:self.segment_size]
+        segments = self.segments + [self._write_segment(batch)]
+        self._write_index(segments)
+        self.segments = segments
+        self.overflow = self.overflow[self.segment_size:]
+
+    def _seal_background(self):
+        """
+        后台线程封存：压缩和 fsync 在锁外执行，期间新消息的追加不受影响
+        封存期间被删除的消息已写入分段，改为记录为归档删除；封存期间被清空时丢弃写出的分段
+        """
+        try:
+            while True:
+                with self.lock:
+                    if len(self.overflow) < self.segment_size:
+                        return
+                    batch = self.overflow[:self.segment_size]
+                    epoch = self._clear_epoch
+                entry = self._write_segment(batch)
+                with self.lock:
+                    if epoch != self._clear_epoch:
+                        os.remove(ARCHIVE_DIR / entry['file'])
+                        continue
+                    segments = self.segments + [entry]
+                self._write_index(segments, '.seal.tmp')
+                with self.lock:
+                    if epoch != self._clear_epoch:
+                        # 索引写入期间被清空：按当前状态重写索引
+                        os.remove(ARCHIVE_DIR / entry['file'])
+                        if self.segments:
+                            self._write_index(self.segments)
+                        elif ARCHIVE_INDEX_FILE.exists():
+                            os.remove(ARCHIVE_INDEX_FILE)
+                        continue
+                    remaining = {msg['seq'] for msg in self.overflow}
+                    deleted = [msg['seq'] for msg in batch if msg['seq'] not in remaining]
+                    if deleted:
+                        self._append({'op': 'del_archived', 'seqs': deleted})
+                        self.archived_deleted.update(deleted)
+                    self.segments = segments
+                    self.overflow = [msg for msg in self.overflow if msg['seq'] > entry['last_seq']]
+        except Exception as e:
+            print(f"封存聊天归档失败: {e}")
+        finally:
+            self._sealing = False
+
+    def _drop_archive(self, upto_seq: int):
+        """删除序号不超过 upto_seq 的归档分段（清空消息时）"""
+        keep = [s for s in self.segments if s['last_seq'] > upto_seq]
+        if len(keep) == len(self.segments):
+            return
+        if keep:
+            self._write_index(keep)
+        elif ARCHIVE_INDEX_FILE.exists():
+            os.remove(ARCHIVE_INDEX_FILE)
+        for segment in self.segments[:len(self.segments) - len(keep)]:
+            try:
+                os.remove(ARCHIVE_DIR / segment['file'])
+            except FileNotFoundError:
+                pass
+        self.segments = keep
+        self.archived_deleted = {seq for seq in self.archived_deleted if seq > upto_seq}
+        _read_segment.cache_clear()
+
+    def _remove(self, message_id: str) -> bool:
+        """从热窗口或待归档区删除一条消息（已封存的分段只读）"""
+        remaining = [msg for msg in self.messages if msg.get('id') != message_id]
+        if len(remaining) < len(self.messages):
+            self.messages = deque(remaining, maxlen=self.hot_window)
+            return True
+        remaining = [msg for msg in self.overflow if msg.get('id') != message_id]
+        if len(remaining) < len(self.overflow):
+            self.overflow = remaining
+            return True
+        return False
+
+    def _find_archived(self, message_id: str) -> Optional[int]:
+        """在归档分段中查找未删除的消息，返回其序号（从最新的分段向前查找）"""
+        with self.lock:
+            segments = list(self.segments)
+        for segment in reversed(segments):
+            for msg in _read_segment(segment['file']):
+                if msg.get('id') == message_id and msg['seq'] not in self.archived_deleted:
+                    return msg['seq']
+        return None
+
+    # ========== 日志 ==========
+
+    def _append(self, record: Dict[str, Any]):
+        """追加一条日志记录（只写入缓冲区，调用 sync 后才落盘）"""
+        self._log.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._log_records += 1
+        if self._log_records > COMPACT_THRESHOLD and not self._compacting:
+            self._compacting = True
+            threading.Thread(target=self.compact, daemon=True).start()
+
+    def sync(self):
+        """
+        将已追加的日志记录写入磁盘（flush + fsync）
+        fsync 在锁外执行，期间新的追加不会被阻塞
+        """
+        with self.lock:
+            self._log.flush()
+            fd = os.dup(self._log.fileno())
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _write_snapshot(self):
+        """将当前状态（待归档区 + 热窗口）写成新日志"""
+        lines = [json.dumps({'op': 'seq', 'seq': self.seq})]
+        if self.archived_deleted:
+            lines.append(json.dumps({'op': 'del_archived', 'seqs': sorted(self.archived_deleted)}))
+        for msg in self.overflow + list(self.messages):
+            lines.append(json.dumps({'op': 'add', 'msg': msg}, ensure_ascii=False))
+        _write_atomic(CHAT_LOG_FILE, ('\n'.join(lines) + '\n').encode('utf-8'))
+        self._log_records = len(lines)
+
+    def compact(self):
+        """压缩日志：丢弃已封存和已删除的记录（后台线程执行，期间追加会短暂等待）"""
+        try:
+            with self.lock:
+                self._log.close()
+                try:
+                    self._write_snapshot()
+                finally:
+                    self._log = open(CHAT_LOG_FILE, 'a', encoding='utf-8')
+        except Exception as e:
+            print(f"压缩聊天日志失败: {e}")
+        finally:
+            self._compacting = False
+
+    # ========== 读写接口 ==========
+
+    def recent(self, limit: int = 0) -> List[Dict[str, Any]]:
+        """获取热窗口中最近的消息（limit <= 0 时返回全部）"""
+        self.load()
+        messages = list(self.messages)
+        return messages[-limit:] if limit > 0 else messages
+
+    def add(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """追加一条消息（分配序号；尚未落盘，需等待 sync 或使用 add_durable）"""
+        self.load()
+        with self.lock:
+            self.seq += 1
+            new_message = {**message, 'seq': self.seq}
+            self._append({'op': 'add', 'msg': new_message})
+            self._push(new_message)
+            return new_message
+
+    async def add_durable(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """追加一条消息，并等待所在批次落盘后返回"""
+        new_message = self.add(message)
+        await self.committer.wait()
+        return new_message
+
+    def delete(self, message_id: str) -> Optional[int]:
+        """
+        删除一条消息并记录墓碑（尚未落盘，需等待 sync 或使用 delete_durable）
+        已封存的消息只记录删除，分段文件不改写
+        :return: 本次变化的序号，消息不存在时返回 None
+        """
+        seq = self._delete_recent(message_id)
+        if seq is not None:
+            return seq
+        archived_seq = self._find_archived(message_id)
+        return self._delete_archived(message_id, archived_seq) if archived_seq is not None else None
+
+    def _delete_recent(self, message_id: str) -> Optional[int]:
+        """从热窗口或待归档区删除消息；不在其中时返回 None"""
+        self.load()
+        with self.lock:
+            if not any(msg.get('id') == message_id for msg in self.messages) \
+                    and not any(msg.get('id') == message_id for msg in self.overflow):
+                return None
+            self.seq += 1
+            self._append({'op': 'del', 'id': message_id, 'seq': self.seq})
+            self._remove(message_id)
+            return self._add_tombstone(message_id)
+
+    def _delete_archived(self, message_id: str, archived_seq: int) -> Optional[int]:
+        """记录已封存消息的删除（archived_seq 由 _find_archived 查得）"""
+        with self.lock:
+            # 查找期间分段可能已被清空
+            if not self.segments or archived_seq < self.segments[0]['first_seq']:
+                return None
+            self.seq += 1
+            self._append({'op': 'del_archived', 'id': message_id, 'seqs': [archived_seq], 'seq': self.seq})
+            self.archived_deleted.add(archived_seq)
+            return self._add_tombstone(message_id)
+
+    def _add_tombstone(self, message_id: str) -> int:
+        """为刚分配的序号记录删除，超出数量时丢弃最旧的（需持有锁）"""
+        self.tombstones.append((self.seq, message_id))
+        while len(self.tombstones) > MAX_TOMBSTONES:
+            dropped_seq, _ = self.tombstones.popleft()
+            self.reset_seq = dropped_seq
+        return self.seq
+
+    async def delete_durable(self, message_id: str) -> Optional[int]:
+        """
+        删除一条消息，并等待所在批次落盘后返回
+        只有查找归档分段（需要解压）在线程中执行；分配序号和加入提交批次在事件循环中一步完成，
+        保证推送顺序与序号顺序一致
+        """
+        seq = self._delete_recent(message_id)
+        if seq is None:
+            archived_seq = await asyncio.to_thread(self._find_archived, message_id)
+            if archived_seq is None:
+                return None
+            seq = self._delete_archived(message_id, archived_seq)
+            if seq is None:
+                return None
+        await self.committer.wait()
+        return seq
+
+    def clear(self) -> int:
+        """清空所有消息（含归档；尚未落盘，需等待 sync 或使用 clear_durable）；之前的客户端全部需要全量刷新"""
+        self.load()
+        with self.lock:
+            self.seq += 1
+            self._append({'op': 'clear', 'seq': self.seq})
+            self._clear_epoch += 1
+            self.messages.clear()
+            self.overflow.clear()
+            self._drop_archive(self.seq)
+            self.tombstones.clear()
+            self.reset_seq = self.seq
+            return self.seq
+
+    async def clear_durable(self) -> int:
+        """清空所有消息，并等待所在批次落盘后返回"""
+        seq = self.clear()
+        await self.committer.wait()
+        return seq
+
+    def changes_since(self, since: int) -> Optional[Tuple[List[Dict[str, Any]], List[str]]]:
+        """
+        获取序号大于 since 的新消息和被删除的消息 ID
+        :return: 无法增量同步时返回 None
+        """
+        self.load()
+        if since < self.reset_seq or since > self.seq:
+            return None
+
+        new_messages = []
+        for msg in reversed(self.messages):
+            if msg['seq'] <= since:
+                break
+            new_messages.append(msg)
+        new_messages.reverse()
+
+        deleted = []
+        for seq, message_id in reversed(self.tombstones):
+            if seq <= since:
+                break
+            deleted.append(message_id)
+
+        return new_messages, deleted
+
+    def history(self, before: Optional[int], limit: int) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        按序号向前翻阅历史消息（每页只读取内存或一个归档分段）
+        :param before: 只返回序号小于该值的消息，为 None 时从最新一条开始
+        :return: (按序号升序的消息, 下一页的 before)，没有更早的消息时为 None
+        """
+        self.load()
+        with self.lock:
+            memory = self.overflow + list(self.messages)
+            segments = list(self.segments)
+        if before is None:
+            before = self.seq + 1
+
+        items: List[Dict[str, Any]] = []
+        if memory and before > memory[0]['seq']:
+            items = [msg for msg in memory if msg['seq'] < before][-limit:]
+        else:
+            # 定位包含 before 之前消息的分段；分段内消息可能已被跳过，向前找到第一个非空的分段
+            index = bisect_left([s['first_seq'] for s in segments], before) - 1
+            while index >= 0 and not items:
+                messages = _read_segment(segments[index]['file'])
+                items = [
+                    msg for msg in messages
+                    if msg['seq'] < before and msg['seq'] not in self.archived_deleted
+                ][-limit:]
+                index -= 1
+
+        earliest = segments[0]['first_seq'] if segments else (memory[0]['seq'] if memory else 0)
+        next_before = items[0]['seq'] if items and items[0]['seq'] > earliest else None
+        return items, next_before
+
+# 进程级存储实例
+chat_store = ChatStore()
@@ -0,0 +1,249 @@
+"""
+正文快照（发布时物化）
+为每个内容类型预先生成排序、校验、序列化后的 JSON 字节及其压缩版本，
+公开接口直接返回这些字节，只有正文变化时才重新生成
+"""
+import base64
+import gzip
+import hashlib
+import json
+import threading
+from bisect import bisect_left
+from typing import List, Dict, Any, Optional, Tuple
+from pydantic import TypeAdapter
+from backend.schemas.content import ContentResponse
+from backend.services.image_index import image_index
+from backend.services.image_processing import image_size, image_srcset
+from backend.utils.file_storage import ADMIN_DATA_DIR, ContentStorage, file_signature
+from backend.utils.http_cache import make_etag
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，未安装时只提供 gzip
+    brotli = None
+
+# 小于该大小的响应体不压缩（压缩收益小于开销）
+MIN_COMPRESS_SIZE = 1024
+
+# 摘要投影中正文摘录的长度（字符数）
+SUMMARY_EXCERPT_LENGTH = 100
+
+# 上传图片目录及其 URL 前缀（用于查找缩小版本）
+IMAGES_DIR = ADMIN_DATA_DIR / "images"
+IMAGES_URL_PREFIX = "/media/images/"
+
+_posts_adapter = TypeAdapter(List[ContentResponse])
+_post_adapter = TypeAdapter(ContentResponse)
+
+class ContentSnapshot:
+    """某一内容类型的正文快照"""
+
+    def __init__(self, storage: ContentStorage, signature: Optional[Tuple[int, int, int]], models: List[ContentResponse]):
+        self.content_type = storage.content_type
+        self.file_path = storage.file_path
+        self.signature = signature
+        # 已发布、按 (created_at, id) 倒序、经 ContentResponse 校验后的文章
+        self.posts: List[Dict[str, Any]] = [m.model_dump() for m in models]
+        self.models: Dict[str, ContentResponse] = {m.id: m for m in models}
+        # 单篇文章的序列化结果按需生成：post_id -> (响应体, ETag)
+        self._post_bodies: Dict[str, Tuple[bytes, str]] = {}
+        # 每篇文章的图片元数据：post_id -> {图片 URL: {width, height, color, placeholder}}
+        self.image_meta: Dict[str, Dict[str, Dict[str, Any]]] = {p['id']: post_image_meta(p) for p in self.posts}
+        self.summaries: List[Dict[str, Any]] = [summarize_post(p, self.image_meta[p['id']]) for p in self.posts]
+        # 摘要和图片元数据来自图片索引和磁盘上的缩小版本，正文不变时也可能变化，单独参与 ETag
+        self.image_meta_hash = _hash_json([self.summaries, self.image_meta])
+        # 升序排列的排序键，用于按游标二分定位
+        self.sort_keys = [(p['created_at'], p['id']) for p in reversed(self.posts)]
+        self.body = _posts_adapter.dump_json(models)
+        self.body_gzip = _compress_gzip(self.body)
+        self.body_br = _compress_br(self.body)
+        # 强 ETag 由响应体哈希生成；Last-Modified 取正文文件修改时间
+        self.etag = make_etag(self.content_type, hashlib.sha1(self.body).hexdigest())
+        self.last_modified = signature[0] / 1e9 if signature else None
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        """不同压缩编码是不同的表示，强 ETag 需要区分"""
+        if not encoding:
+            return self.etag
+        return f'{self.etag[:-1]}-{encoding}"'
+
+    def post_body(self, post_id: str) -> Optional[Tuple[bytes, str]]:
+        """
+        获取单篇文章的 JSON 字节和 ETag（通过 id 索引查找，首次访问时序列化）
+        :return: 文章不存在或未发布时返回 None
+        """
+        cached = self._post_bodies.get(post_id)
+        if cached is not None:
+            return cached
+        model = self.models.get(post_id)
+        if model is None:
+            return None
+        body = _post_adapter.dump_json(model)
+        cached = (body, make_etag(self.content_type, post_id, hashlib.sha1(body).hexdigest()))
+        self._post_bodies[post_id] = cached
+        return cached
+
+    def post_image_meta_hash(self, post_id: str) -> str:
+        """单篇文章图片元数据的哈希（参与 include=image_meta 响应的 ETag）"""
+        return _hash_json(self.image_meta.get(post_id))
+
+    def with_image_meta(self, posts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """为完整文章附加 image_meta 字段"""
+        return [{**post, 'image_meta': self.image_meta[post['id']]} for post in posts]
+
+    def post_with_image_meta(self, post_id: str) -> Optional[Dict[str, Any]]:
+        """单篇文章（附加 image_meta 字段），不存在或未发布时返回 None"""
+        model = self.models.get(post_id)
+        if model is None:
+            return None
+        return {**model.model_dump(), 'image_meta': self.image_meta[post_id]}
+
+    def page(self, cursor: Optional[str], limit: int, summary: bool = False,
+             include_image_meta: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        按游标分页
+        :param cursor: 上一页返回的 next_cursor，为 None 时从最新一篇开始
+        :param include_image_meta: 完整文章附加 image_meta 字段（摘要始终包含首图的元数据）
+        :return: (本页文章, 下一页游标)，没有更多时游标为 None
+        """
+        start = 0
+        if cursor is not None:
+            # 排在游标之后（更旧）的文章数量即为倒序列表中的起始下标
+            start = len(self.posts) - bisect_left(self.sort_keys, decode_cursor(cursor))
+        end = start + limit
+        items = (self.summaries if summary else self.posts)[start:end]
+        if include_image_meta and not summary:
+            items = self.with_image_meta(items)
+        next_cursor = None
+        if end < len(self.posts):
+            last = self.posts[end - 1]
+            next_cursor = encode_cursor((last['created_at'], last['id']))
+        return items, next_cursor
+
+    def encoded_body(self, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+        """
+        根据 Accept-Encoding 选择响应体
+        :return: (响应体, Content-Encoding)，未压缩时编码为 None
+        """
+        accepted = {token.split(';')[0].strip() for token in accept_encoding.lower().split(',')}
+        if self.body_br is not None and 'br' in accepted:
+            return self.body_br, 'br'
+        if self.body_gzip is not None and 'gzip' in accepted:
+            return self.body_gzip, 'gzip'
+        return self.body, None
+
+def image_meta(url: str) -> Optional[Dict[str, Any]]:
+    """
+    上传图片的宽高、主色调和占位图
+    上传时未记录元数据的旧图片只读取文件头获取宽高；不是上传图片时返回 None
+    """
+    if not url or not url.startswith(IMAGES_URL_PREFIX):
+        return None
+    filename = url[len(IMAGES_URL_PREFIX):]
+    meta = image_index.get_meta(filename)
+    if meta is not None:
+        return meta
+    size = image_size(IMAGES_DIR / filename)
+    return {'width': size[0], 'height': size[1]} if size else None
+
+def post_image_meta(post: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """文章中每张图片的元数据：图片 URL -> 元数据（没有元数据的图片不列出）"""
+    result = {}
+    for url in post.get('images') or []:
+        meta = image_meta(url)
+        if meta is not None:
+            result[url] = meta
+    return result
+
+def summarize_post(post: Dict[str, Any], images_meta: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """摘要投影：列表页只需要标题、摘录和首图（含缩小版本的 srcset 和占位用的元数据）"""
+    images = post.get('images') or []
+    content = post.get('content') or ''
+    excerpt = content if len(content) <= SUMMARY_EXCERPT_LENGTH else content[:SUMMARY_EXCERPT_LENGTH] + '...'
+    image = images[0] if images else None
+    srcset = None
+    if image and image.startswith(IMAGES_URL_PREFIX):
+        srcset = image_srcset(IMAGES_DIR, image)
+    return {
+        'id': post['id'],
+        'type': post['type'],
+        'title': post.get('title'),
+        'excerpt': excerpt,
+        'image': image,
+        'image_srcset': srcset,
+        'image_meta': images_meta.get(image) if image else None,
+        'created_at': post['created_at'],
+    }
+
+def encode_cursor(key: Tuple[str, str]) -> str:
+    """将排序键编码为不透明游标"""
+    raw = json.dumps(list(key), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """解码游标（格式错误时抛出 ValueError）"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, post_id = json.loads(raw)
+    except Exception:
+        raise ValueError("无效的游标")
+    if not isinstance(created_at, str) or not isinstance(post_id, str):
+        raise ValueError("无效的游标")
+    return created_at, post_id
+
+def _hash_json(data: Any) -> str:
+    """JSON 数据的短哈希"""
+    raw = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+def _compress_gzip(body: bytes) -> Optional[bytes]:
+    """gzip 压缩（压缩后不更小则返回 None）"""
+    if len(body) < MIN_COMPRESS_SIZE:
+        return None
+    compressed = gzip.compress(body, compresslevel=9, mtime=0)
+    return compressed if len(compressed) < len(body) else None
+
+def _compress_br(body: bytes) -> Optional[bytes]:
+    """brotli 压缩（未安装或压缩后不更小则返回 None）"""
+    if brotli is None or len(body) < MIN_COMPRESS_SIZE:
+        return None
+    compressed = brotli.compress(body, quality=11)
+    return compressed if len(compressed) < len(body) else None
+
+# 进程级快照缓存：content_type -> ContentSnapshot
+_snapshots: Dict[str, ContentSnapshot] = {}
+_snapshots_lock = threading.Lock()
+
+def build_snapshot(content_type: str) -> ContentSnapshot:
+    """从正文文件重新生成快照"""
+    storage = ContentStorage(content_type)
+    # 先取签名再读数据：读取期间文件若被改写，下次请求会因签名不一致再次重建
+    signature = file_signature(storage.file_path)
+    all_posts = storage.get_all()
+
+    # 只保留已发布的内容，按创建时间倒序（创建时间相同时按 ID，保证游标分页顺序唯一）
+    published_posts = [p for p in all_posts if p.get('status') == 'published']
+    published_posts.sort(key=lambda x: (x.get('created_at', ''), x.get('id', '')), reverse=True)
+    models = _posts_adapter.validate_python(published_posts)
+
+    snapshot = ContentSnapshot(storage, signature, models)
+    with _snapshots_lock:
+        _snapshots[content_type] = snapshot
+    return snapshot
+
+def get_snapshot(content_type: str) -> ContentSnapshot:
+    """获取快照（正文文件签名变化时自动重建）"""
+    snapshot = _snapshots.get(content_type)
+    if snapshot is not None and snapshot.signature == file_signature(snapshot.file_path):
+        return snapshot
+    return build_snapshot(content_type)
+
+def refresh_snapshot(content_type: str):
+    """正文变化后调用：立即重建快照（发布时物化）"""
+    with _snapshots_lock:
+        _snapshots.pop(content_type, None)
+    try:
+        build_snapshot(content_type)
+    except Exception as e:
+        # 重建失败不影响写入流程，下次读取时会再次尝试
+        print(f"重建 {content_type} 快照失败: {e}")
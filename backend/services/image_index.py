@@ -0,0 +1,279 @@
+"""
+图片索引（内容寻址存储的元数据）
+- inputs：上传原文件的哈希（含编码参数）-> 转换结果，重复上传同一张图片时跳过编码
+- files：图片目录中的原图文件名（不含缩小版本），由上传和删除维护
+- posts：文章（{类型}/{ID}）-> 引用的图片文件名，草稿和正文两个版本引用的图片都计入；
+  内存中同时维护反向索引 refs（文件名 -> 引用它的文章），文章不再使用时才删除文件
+- meta：文件名 -> 宽高、主色调和内联占位图，公开接口据此让页面提前占位
+未引用图片 = files - refs，直接在内存中计算，不扫描磁盘和文章文件；
+rebuild 从磁盘和文章文件重新生成 files 和 posts，用于校验索引
+索引持久化到 admin_data/image_index.json：修改后由后台写入线程整体重写（合并连续的修改），
+不阻塞事件循环；进程退出前调用 flush 写入最新状态
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+from backend.services.image_processing import source_filename
+from backend.utils.file_storage import ADMIN_DATA_DIR
+
+# 索引文件路径
+IMAGE_INDEX_FILE = ADMIN_DATA_DIR / "image_index.json"
+
+# 草稿、正文和图片目录
+DRAFTS_DIR = ADMIN_DATA_DIR / "drafts"
+PUBLISHED_DIR = ADMIN_DATA_DIR / "published"
+IMAGES_DIR = ADMIN_DATA_DIR / "images"
+
+# 图片目录中存放的图片格式
+IMAGE_PATTERNS = ('*.webp', '*.avif', '*.gif')
+
+def image_filenames(post: Dict[str, Any]) -> Set[str]:
+    """文章引用的图片文件名"""
+    return {url.split('/')[-1] for url in post.get('images') or [] if url}
+
+def post_key(content_type: str, post_id: str) -> str:
+    """文章在索引中的键：{类型}/{ID}"""
+    return f"{content_type}/{post_id}"
+
+class ImageIndex:
+    """图片输入哈希索引、引用索引和元数据"""
+
+    def __init__(self, index_file=IMAGE_INDEX_FILE):
+        self.index_file = index_file
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.inputs: Dict[str, Dict[str, Any]] = {}
+        self.files: Set[str] = set()
+        self.posts: Dict[str, Set[str]] = {}
+        self.refs: Dict[str, Set[str]] = {}
+        self.meta: Dict[str, Dict[str, Any]] = {}
+        # 后台写入：有未写入的修改时置位；写入锁保证快照按顺序落盘
+        self._dirty = threading.Event()
+        self._write_lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+
+    # ========== 持久化 ==========
+
+    def _load(self):
+        """从磁盘加载索引；没有索引或为旧格式时扫描磁盘和文章文件重建"""
+        if self.loaded:
+            return
+        self.loaded = True
+        if self.index_file.exists():
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.inputs = data.get('inputs', {})
+                self.meta = data.get('meta', {})
+                if 'posts' in data and 'files' in data:
+                    self.files = set(data['files'])
+                    self.posts = {key: set(names) for key, names in data['posts'].items()}
+                    self._build_refs()
+                    return
+            except Exception as e:
+                print(f"读取图片索引失败，将重建: {e}")
+        self.rebuild()
+
+    def _save(self):
+        """标记索引已修改，由后台线程写入（需持有锁）"""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, daemon=True)
+            self._writer.start()
+        self._dirty.set()
+
+    def _write_loop(self):
+        """后台写入线程：写入期间的多次修改合并为下一次写入"""
+        while True:
+            self._dirty.wait()
+            self._dirty.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"写入图片索引失败: {e}")
+
+    def flush(self):
+        """立即把当前状态写入磁盘（先写临时文件再替换）"""
+        with self._write_lock:
+            # 锁内只做浅拷贝，序列化和写文件在锁外进行
+            with self.lock:
+                data = {
+                    'inputs': dict(self.inputs),
+                    'files': sorted(self.files),
+                    'posts': {key: sorted(names) for key, names in self.posts.items()},
+                    'meta': dict(self.meta),
+                }
+            self.index_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_file.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self.index_file)
+
+    def _build_refs(self):
+        """由 posts 生成反向索引"""
+        refs: Dict[str, Set[str]] = {}
+        for key, names in self.posts.items():
+            for filename in names:
+                refs.setdefault(filename, set()).add(key)
+        self.refs = refs
+
+    @staticmethod
+    def _scan_posts() -> Dict[str, Set[str]]:
+        """扫描所有草稿和正文文件，统计每篇文章引用的图片"""
+        posts: Dict[str, Set[str]] = {}
+        for directory in (DRAFTS_DIR, PUBLISHED_DIR):
+            for data_file in directory.glob('*.json'):
+                try:
+                    with open(data_file, 'r', encoding='utf-8') as f:
+                        items = json.load(f).get('posts', [])
+                except Exception:
+                    continue
+                for post in items:
+                    names = image_filenames(post)
+                    if names:
+                        # 文件名即内容类型
+                        posts.setdefault(post_key(data_file.stem, post.get('id', '')), set()).update(names)
+        return posts
+
+    @staticmethod
+    def _scan_files() -> Set[str]:
+        """扫描图片目录中的原图（缩小版本随原图管理，不单独计入）"""
+        return {
+            path.name
+            for pattern in IMAGE_PATTERNS
+            for path in IMAGES_DIR.glob(pattern)
+            if source_filename(path.name) == path.name
+        }
+
+    def rebuild(self) -> Dict[str, List[str]]:
+        """
+        从磁盘和文章文件重新生成 files 和 posts（校验模式）
+        :return: 重建前索引与实际情况的差异 {missing_files, stale_files, changed_posts}
+        """
+        with self.lock:
+            self.loaded = True
+            files = self._scan_files()
+            posts = self._scan_posts()
+            changed_posts = {key for key in set(self.posts) | set(posts) if self.posts.get(key) != posts.get(key)}
+            drift = {
+                'missing_files': sorted(files - self.files),
+                'stale_files': sorted(self.files - files),
+                'changed_posts': sorted(changed_posts),
+            }
+            self.files = files
+            self.posts = posts
+            self._build_refs()
+            self._save()
+            return drift
+
+    # ========== 输入去重 ==========
+
+    def lookup_input(self, key: str) -> Optional[Dict[str, Any]]:
+        """查找相同输入的转换结果"""
+        with self.lock:
+            self._load()
+            return self.inputs.get(key)
+
+    def record_upload(self, key: str, result: Dict[str, Any], meta: Dict[str, Any]):
+        """
+        登记一次新上传：图片文件、元数据和输入对应的转换结果（一次写入）
+        :param key: input_key
+        :param result: 转换结果（不含占位图）
+        :param meta: 宽高、主色调和占位图
+        """
+        with self.lock:
+            self._load()
+            self.files.add(result['filename'])
+            self.meta[result['filename']] = meta
+            self.inputs[key] = result
+            self._save()
+
+    # ========== 图片文件 ==========
+
+    def add_file(self, filename: str):
+        """上传后登记图片文件"""
+        with self.lock:
+            self._load()
+            if filename not in self.files:
+                self.files.add(filename)
+                self._save()
+
+    def forget_file(self, filename: str):
+        """文件被删除后，移除指向它的所有记录"""
+        with self.lock:
+            self._load()
+            stale = [key for key, result in self.inputs.items() if result.get('filename') == filename]
+            for key in stale:
+                del self.inputs[key]
+            changed = bool(stale) or filename in self.files or filename in self.meta
+            self.files.discard(filename)
+            self.meta.pop(filename, None)
+            if changed:
+                self._save()
+
+    # ========== 图片元数据 ==========
+
+    def get_meta(self, filename: str) -> Optional[Dict[str, Any]]:
+        """获取图片元数据（上传时未记录的返回 None）"""
+        with self.lock:
+            self._load()
+            return self.meta.get(filename)
+
+    # ========== 引用索引 ==========
+
+    def ref_count(self, filename: str) -> int:
+        """图片被多少篇文章引用"""
+        with self.lock:
+            self._load()
+            return len(self.refs.get(filename, ()))
+
+    def referencing_posts(self, filename: str) -> List[str]:
+        """引用该图片的文章（{类型}/{ID}）"""
+        with self.lock:
+            self._load()
+            return sorted(self.refs.get(filename, ()))
+
+    def referenced(self) -> Set[str]:
+        """所有被引用的图片文件名"""
+        with self.lock:
+            self._load()
+            return set(self.refs)
+
+    def unreferenced(self) -> Set[str]:
+        """图片目录中没有被任何文章引用的原图"""
+        with self.lock:
+            self._load()
+            return self.files - self.refs.keys()
+
+    def set_post_images(self, key: str, filenames: Iterable[str]) -> List[str]:
+        """
+        文章（草稿或正文）写入后更新它引用的图片
+        :param key: post_key(类型, ID)
+        :param filenames: 文章草稿和正文版本引用的全部图片，为空表示文章已删除
+        :return: 不再被任何文章引用、可以删除的文件名
+        """
+        with self.lock:
+            self._load()
+            new = set(filenames)
+            old = self.posts.get(key, set())
+            if new == old:
+                return []
+            for filename in new - old:
+                self.refs.setdefault(filename, set()).add(key)
+            released = []
+            for filename in old - new:
+                holders = self.refs.get(filename)
+                if holders is not None:
+                    holders.discard(key)
+                    if not holders:
+                        del self.refs[filename]
+                        released.append(filename)
+            if new:
+                self.posts[key] = new
+            else:
+                self.posts.pop(key, None)
+            self._save()
+            return released
+
+# 进程级索引实例
+image_index = ImageIndex()
@@ -0,0 +1,293 @@
+"""
+后台图片处理任务队列
+- 批量上传时先把文件保存到暂存目录、登记任务后立即返回任务 ID，编码在后台逐张进行
+- 任务状态追加写入日志（admin_data/image_jobs.jsonl），重启后未处理完的图片继续处理
+- 已结束的任务保留 IMAGE_JOB_RETENTION 秒供查询，之后在日志压缩时移除
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from backend.config import IMAGE_WORKERS, IMAGE_JOB_RETENTION
+from backend.services.image_processing import ImageQueueFullError, get_file_extension, get_profile
+from backend.services.image_upload import build_upload_result, convert_saved_upload
+from backend.utils.file_storage import ADMIN_DATA_DIR
+
+# 任务日志文件
+IMAGE_JOBS_FILE = ADMIN_DATA_DIR / "image_jobs.jsonl"
+
+# 等待处理的上传文件暂存目录（与图片目录在同一文件系统，登记时直接改名）
+SPOOL_DIR = ADMIN_DATA_DIR / "upload_spool"
+
+# 日志行数超过该值时压缩
+COMPACT_THRESHOLD = 1000
+
+# 进程池排队已满时的重试间隔（秒）
+RETRY_DELAY = 0.5
+
+def _write_atomic(path: Path, data: bytes):
+    """先写临时文件再原子替换"""
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class ImageJobQueue:
+    """持久化的图片处理任务队列"""
+
+    def __init__(self, log_file: Path = IMAGE_JOBS_FILE, spool_dir: Path = SPOOL_DIR,
+                 workers: int = IMAGE_WORKERS):
+        self.log_file = log_file
+        self.spool_dir = spool_dir
+        self.workers = workers
+        self.lock = threading.RLock()
+        self.loaded = False
+        # 任务 ID -> 任务（含每张图片的状态）
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self._log = None
+        self._log_records = 0
+        # 工作协程绑定的事件循环及待处理队列（事件循环变化时重新创建）
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    # ========== 日志 ==========
+
+    def load(self):
+        """首次使用时重放日志，丢弃过期任务后压缩"""
+        with self.lock:
+            if self.loaded:
+                return
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            if self.log_file.exists():
+                with open(self.log_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            self._apply(json.loads(line))
+                        except Exception:
+                            # 最后一行可能在写入时中断，忽略
+                            continue
+            # 快照可能记录了处理到一半的状态，重启后重新处理
+            for job in self.jobs.values():
+                for item in job['items']:
+                    if item['status'] == 'processing':
+                        item['status'] = 'pending'
+            self._write_snapshot()
+            self._log = open(self.log_file, 'a', encoding='utf-8')
+            self.loaded = True
+            self._remove_orphans()
+
+    def _remove_orphans(self):
+        """删除暂存目录中不属于任何未完成任务的文件（上传中途中断时留下的）"""
+        pending = {
+            item['path'] for job in self.jobs.values() for item in job['items']
+            if item['status'] in ('pending', 'processing')
+        }
+        for path in self.spool_dir.iterdir():
+            if str(path) not in pending:
+                path.unlink(missing_ok=True)
+
+    def _apply(self, record: Dict[str, Any]):
+        """重放一条日志记录"""
+        op = record.get('op')
+        if op == 'job':
+            self.jobs[record['job']['id']] = record['job']
+            return
+        job = self.jobs.get(record.get('id'))
+        if job is None:
+            return
+        if op == 'item':
+            job['items'][record['index']].update(record['item'])
+        elif op == 'finish':
+            job['finished_at'] = record['finished_at']
+
+    def _append(self, record: Dict[str, Any], sync: bool = False):
+        """追加一条日志记录（sync 为 True 时立即落盘）"""
+        self._log.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._log_records += 1
+        self._log.flush()
+        if sync:
+            os.fsync(self._log.fileno())
+
+    def _write_snapshot(self):
+        """丢弃过期任务，将剩余任务写成新日志"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.get('finished_at') and now - job['finished_at'] > IMAGE_JOB_RETENTION
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+        lines = [json.dumps({'op': 'job', 'job': job}, ensure_ascii=False) for job in self.jobs.values()]
+        _write_atomic(self.log_file, ''.join(line + '\n' for line in lines).encode('utf-8'))
+        self._log_records = len(lines)
+
+    def compact(self):
+        """压缩日志：每个任务只保留一条完整记录"""
+        try:
+            with self.lock:
+                self._log.close()
+                try:
+                    self._write_snapshot()
+                finally:
+                    self._log = open(self.log_file, 'a', encoding='utf-8')
+        except Exception as e:
+            print(f"压缩图片任务日志失败: {e}")
+
+    # ========== 工作协程 ==========
+
+    def start(self):
+        """
+        在当前事件循环中启动工作协程，并重新排入所有未处理的图片（需在事件循环中调用）
+        重启后首次调用即恢复中断的任务
+        """
+        self.load()
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+        for job in self.jobs.values():
+            for index, item in enumerate(job['items']):
+                # processing 表示在之前的事件循环中处理到一半，重新处理
+                if item['status'] in ('pending', 'processing'):
+                    item['status'] = 'pending'
+                    self._queue.put_nowait((job['id'], index))
+
+    async def _worker(self):
+        """逐个处理队列中的图片"""
+        while True:
+            job_id, index = await self._queue.get()
+            try:
+                await self._process(job_id, index)
+            except Exception as e:
+                print(f"处理图片任务失败: {e}")
+
+    async def _process(self, job_id: str, index: int):
+        """转换一张图片并记录结果（进程池排队已满时稍后重试）"""
+        job = self.jobs.get(job_id)
+        if job is None or job['items'][index]['status'] != 'pending':
+            return
+        item = job['items'][index]
+        source = Path(item['path'])
+        item['status'] = 'processing'
+        update = {'status': 'failed', 'path': None}
+        try:
+            if not source.exists():
+                raise FileNotFoundError("上传文件已丢失")
+            profile = get_profile(job['profile'])
+            while True:
+                try:
+                    result = await convert_saved_upload(source, item['digest'], item['filename'], profile)
+                    break
+                except ImageQueueFullError:
+                    await asyncio.sleep(RETRY_DELAY)
+            update.update(status='done', result=build_upload_result(result, item['filename']))
+        except Exception as e:
+            update['error'] = f"图片处理失败: {str(e)}"
+
+        # fsync 在线程中执行，不阻塞事件循环
+        await asyncio.to_thread(self._record_result, job, index, update, source)
+
+    def _record_result(self, job: Dict[str, Any], index: int, update: Dict[str, Any], source: Path):
+        """
+        记录一张图片的处理结果
+        结果先落盘再删除暂存文件：两者之间中断时，重启后仍可重新处理
+        """
+        with self.lock:
+            job['items'][index].update(update)
+            self._append({'op': 'item', 'id': job['id'], 'index': index, 'item': update}, sync=True)
+            source.unlink(missing_ok=True)
+            if all(entry['status'] in ('done', 'failed') for entry in job['items']):
+                job['finished_at'] = time.time()
+                self._append({'op': 'finish', 'id': job['id'], 'finished_at': job['finished_at']})
+                if self._log_records > COMPACT_THRESHOLD:
+                    self.compact()
+
+    # ========== 读写接口 ==========
+
+    def submit(self, uploads: List[Tuple[Path, str, str]], profile_name: Optional[str]) -> Dict[str, Any]:
+        """
+        登记任务并排入队列（需在事件循环中调用）
+        :param uploads: [(暂存文件路径, 原文件 SHA-256, 原文件名)]，暂存文件由任务接管
+        :param profile_name: 编码档位名称（None 表示默认档位）
+        :return: 任务状态（同 describe）
+        """
+        self.start()
+        job_id = uuid.uuid4().hex
+        items = []
+        for index, (path, digest, filename) in enumerate(uploads):
+            target = self.spool_dir / f"{job_id}_{index}{get_file_extension(filename)}"
+            os.replace(path, target)
+            items.append({
+                'filename': filename,
+                'path': str(target),
+                'digest': digest,
+                'status': 'pending',
+                'result': None,
+                'error': None,
+            })
+        job = {
+            'id': job_id,
+            'profile': profile_name,
+            'created_at': time.time(),
+            'finished_at': None,
+            'items': items,
+        }
+        with self.lock:
+            self.jobs[job_id] = job
+            self._append({'op': 'job', 'job': job}, sync=True)
+        for index in range(len(items)):
+            self._queue.put_nowait((job_id, index))
+        return self.describe(job)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务状态（不存在或已过期时返回 None）"""
+        self.load()
+        job = self.jobs.get(job_id)
+        return self.describe(job) if job is not None else None
+
+    @staticmethod
+    def describe(job: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        任务状态：status 为 queued / processing / completed，
+        items 中每张图片的 status 为 pending / processing / done / failed，完成的附带上传结果
+        """
+        items = job['items']
+        done = sum(1 for item in items if item['status'] == 'done')
+        failed = sum(1 for item in items if item['status'] == 'failed')
+        if done + failed == len(items):
+            status = 'completed'
+        elif done + failed or any(item['status'] == 'processing' for item in items):
+            status = 'processing'
+        else:
+            status = 'queued'
+        return {
+            'job_id': job['id'],
+            'status': status,
+            'total': len(items),
+            'done': done,
+            'failed': failed,
+            'progress': (done + failed) / len(items) if items else 1.0,
+            'created_at': job['created_at'],
+            'finished_at': job['finished_at'],
+            'items': [
+                {
+                    'filename': item['filename'],
+                    'status': item['status'],
+                    'result': item['result'],
+                    'error': item['error'],
+                }
+                for item in items
+            ],
+        }
+
+# 进程级任务队列实例
+image_jobs = ImageJobQueue()
@@ -0,0 +1,471 @@
+"""
+图片处理
+上传时按编码档位（config.IMAGE_ENCODER_PROFILES）转换为 WebP 或 AVIF，
+并生成若干宽度的缩小版本（{stem}_w{width}.webp / .avif）供 srcset 使用；
+GIF 动图转换为 WebP 动图（保留每帧时长和循环次数），帧数或尺寸超过上限、或转换后更大时保留原 GIF；
+输出文件按内容哈希命名，相同的图片只保存一份；
+同时生成主色调和极小的内联占位图（base64 WebP），页面在原图加载前即可占位；
+WebP 编码是 CPU 密集操作，放到独立的进程池中执行，避免阻塞事件循环；
+进程数和排队上限在 config 中配置，排队已满时拒绝新的任务
+"""
+import asyncio
+import base64
+import glob
+import hashlib
+import io
+import math
+import os
+import re
+import shutil
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from PIL import Image
+from backend.config import (
+    IMAGE_WORKERS, IMAGE_QUEUE_DEPTH, IMAGE_RESIZE_WORKERS, IMAGE_RESIZE_QUEUE_DEPTH, IMAGE_VARIANT_WIDTHS, IMAGE_MAX_EDGE,
+    IMAGE_GIF_MAX_FRAMES, IMAGE_GIF_MAX_EDGE, IMAGE_ENCODER_PROFILES, IMAGE_ENCODER_PROFILE
+)
+
+try:
+    import pillow_avif  # noqa: F401  为旧版 Pillow 注册 AVIF 编码器（可选依赖）
+except ImportError:
+    pillow_avif = None
+
+# 已安装的 Pillow 是否能编码 AVIF（Pillow 11.2+ 内置，或安装了 pillow-avif-plugin）
+Image.init()
+AVIF_SUPPORTED = 'AVIF' in Image.SAVE
+
+# GIF 动图转换为 WebP 动图时的压缩质量（0-100，推荐85-95）
+WEBP_QUALITY = 90
+
+# 按需缩放（/media/images/{name}?w=&q=）的 WebP 压缩方法（0-6，6最慢但压缩最好）
+# 由匿名请求触发，用较快的档位
+RESIZE_WEBP_METHOD = 4
+
+# WebP 动图的压缩方法（每帧都要编码，用比静态图更快的档位）
+ANIMATED_WEBP_METHOD = 4
+
+# GIF 帧时长不超过该值（毫秒）时，浏览器按 GIF_DEFAULT_FRAME_DURATION 播放；转换时沿用该行为
+GIF_MIN_FRAME_DURATION = 10
+GIF_DEFAULT_FRAME_DURATION = 100
+
+# 内联占位图的长边（像素）和 WebP 质量（编码后约 100-300 字节）
+PLACEHOLDER_EDGE = 16
+PLACEHOLDER_QUALITY = 40
+
+# 提取主色调时量化的颜色数
+DOMINANT_COLORS = 4
+
+# 内容寻址文件名中哈希的长度（十六进制字符数）
+CONTENT_HASH_LENGTH = 32
+
+# 计算文件哈希时分块读取的大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 编码输出的扩展名（原样保存的 GIF 除外）
+ENCODED_EXTENSIONS = ('.webp', '.avif')
+
+# 缩小版本文件名：{stem}_w{width}.webp / .avif（与原图格式相同）
+_VARIANT_RE = re.compile(r'^(?P<stem>.+)_w(?P<width>\d+)(?P<ext>\.webp|\.avif)$')
+
+class ImageQueueFullError(Exception):
+    """图片处理排队已满"""
+
+def get_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    获取编码档位的参数
+    :param name: 档位名称，为 None 时使用 config.IMAGE_ENCODER_PROFILE
+    :raises ValueError: 档位不存在，或为 AVIF 但当前 Pillow 不支持
+    """
+    name = name or IMAGE_ENCODER_PROFILE
+    profile = IMAGE_ENCODER_PROFILES.get(name)
+    if profile is None:
+        raise ValueError(f"未知的编码档位: {name}。可用的档位: {', '.join(IMAGE_ENCODER_PROFILES)}")
+    if profile['format'] == 'avif' and not AVIF_SUPPORTED:
+        raise ValueError(f"编码档位 {name} 需要 AVIF 支持，当前安装的 Pillow 不支持")
+    return profile
+
+def available_profiles() -> List[str]:
+    """当前环境可用的编码档位名称"""
+    return [name for name, profile in IMAGE_ENCODER_PROFILES.items() if profile['format'] != 'avif' or AVIF_SUPPORTED]
+
+def get_file_extension(filename: str) -> str:
+    """获取文件扩展名"""
+    return os.path.splitext(filename)[1].lower()
+
+def variant_filename(filename: str, width: int) -> str:
+    """缩小版本的文件名：{stem}_w{width}{原图扩展名}"""
+    stem, extension = os.path.splitext(filename)
+    return f"{stem}_w{width}{extension}"
+
+def source_filename(filename: str) -> str:
+    """缩小版本对应的原图文件名（原图返回自身）"""
+    match = _VARIANT_RE.match(filename)
+    return f"{match.group('stem')}{match.group('ext')}" if match else filename
+
+def variant_files(images_dir: Path, filename: str) -> List[Path]:
+    """列出某张原图在磁盘上的所有缩小版本"""
+    stem, extension = os.path.splitext(filename)
+    if extension not in ENCODED_EXTENSIONS:
+        return []
+    return [
+        path for path in images_dir.glob(f"{glob.escape(stem)}_w*{extension}")
+        if source_filename(path.name) == filename
+    ]
+
+def delete_image_files(images_dir: Path, filename: str) -> int:
+    """
+    删除原图及其所有缩小版本
+    :return: 释放的字节数
+    """
+    freed = 0
+    for path in [images_dir / filename] + variant_files(images_dir, filename):
+        try:
+            freed += path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            pass
+    return freed
+
+def image_srcset(images_dir: Path, url: str) -> Optional[str]:
+    """
+    根据磁盘上已有的缩小版本生成 srcset（没有缩小版本时返回 None）
+    原图宽度只读取文件头，不解码像素
+    """
+    filename = url.split('/')[-1]
+    variants = variant_files(images_dir, filename)
+    if not variants:
+        return None
+    prefix = url[:len(url) - len(filename)]
+    entries = sorted((int(_VARIANT_RE.match(path.name).group('width')), prefix + path.name) for path in variants)
+    try:
+        with Image.open(images_dir / filename) as image:
+            entries.append((image.width, url))
+    except Exception:
+        pass
+    return ', '.join(f"{src} {width}w" for width, src in entries)
+
+def file_digest(path: str) -> str:
+    """文件内容的 SHA-256（分块读取）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def image_size(path: Path) -> Optional[Tuple[int, int]]:
+    """图片宽高（只读取文件头，不解码像素；无法识别时返回 None）"""
+    try:
+        with Image.open(path) as image:
+            return image.size
+    except Exception:
+        return None
+
+def image_preview(image: Image.Image) -> Dict[str, str]:
+    """
+    主色调和内联占位图
+    :return: {color: '#rrggbb', placeholder: 'data:image/webp;base64,...'}
+    """
+    small = image.copy()
+    # 先用 reduce 整数倍缩小再精确缩放，大图也很快
+    small.thumbnail((PLACEHOLDER_EDGE, PLACEHOLDER_EDGE), Image.Resampling.LANCZOS, reducing_gap=2.0)
+    if small.mode not in ('RGB', 'RGBA'):
+        small = small.convert('RGBA')
+
+    # 主色调：量化后像素最多的颜色（忽略透明像素）
+    rgb = small.convert('RGB')
+    if small.mode == 'RGBA':
+        opaque = [pixel for pixel, alpha in zip(rgb.getdata(), small.getchannel('A').getdata()) if alpha >= 128]
+        if opaque:
+            rgb = Image.new('RGB', (len(opaque), 1))
+            rgb.putdata(opaque)
+    quantized = rgb.quantize(colors=DOMINANT_COLORS)
+    _, index = max(quantized.getcolors())
+    r, g, b = quantized.getpalette()[index * 3:index * 3 + 3]
+
+    buffer = io.BytesIO()
+    small.save(buffer, format='WEBP', quality=PLACEHOLDER_QUALITY, method=6)
+    return {
+        'color': f"#{r:02x}{g:02x}{b:02x}",
+        'placeholder': 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii'),
+    }
+
+def content_filename(digest: str, extension: str) -> str:
+    """内容寻址文件名：内容哈希前 32 位 + 扩展名"""
+    return f"{digest[:CONTENT_HASH_LENGTH]}{extension}"
+
+def profile_signature(profile: Dict[str, Any]) -> str:
+    """编码档位参数的稳定文本表示（用于去重键和缓存文件名）"""
+    return ','.join(f"{key}={profile[key]}" for key in sorted(profile))
+
+def input_key(input_digest: str, original_filename: str, profile: Dict[str, Any]) -> str:
+    """
+    上传原文件的去重键：原文件哈希 + 影响输出的编码参数（含编码档位）
+    参数变化后同一张图片会重新编码
+    """
+    if get_file_extension(original_filename) == '.gif':
+        # 静态 GIF 按普通图片转换，动图按 GIF 参数转换，两组参数都计入
+        gif = f":gif:q{WEBP_QUALITY}:m{ANIMATED_WEBP_METHOD}:f{IMAGE_GIF_MAX_FRAMES}:g{IMAGE_GIF_MAX_EDGE}"
+    else:
+        gif = ''
+    widths = ','.join(map(str, sorted(set(IMAGE_VARIANT_WIDTHS))))
+    return f"{input_digest}:{profile_signature(profile)}:w{widths}:e{IMAGE_MAX_EDGE}{gif}"
+
+def is_animated(source_path: str) -> bool:
+    """图片是否为多帧动图（只读取文件头）"""
+    with Image.open(source_path) as image:
+        return getattr(image, 'is_animated', False)
+
+def open_image(source_path: str, max_edge: Optional[int] = IMAGE_MAX_EDGE) -> Image.Image:
+    """
+    打开并解码图片，长边超过 max_edge 时等比缩小
+    JPEG 通过 draft 在解码时直接按 1/2、1/4、1/8 缩小，不分配全尺寸的像素缓冲
+    调色板模式转换为RGBA，保留透明度；RGBA 保持不变；其他模式转为RGB
+    """
+    with Image.open(source_path) as image:
+        if max_edge and max(image.size) > max_edge and image.format == 'JPEG':
+            scale = max_edge / max(image.size)
+            # draft 选取不小于请求尺寸的最大缩小比例，之后再精确缩放
+            image.draft(None, (math.ceil(image.width * scale), math.ceil(image.height * scale)))
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB')
+        else:
+            image.load()
+
+    if max_edge and max(image.size) > max_edge:
+        # thumbnail 先用 reduce 整数倍缩小，再用 LANCZOS 精确缩放
+        image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    return image
+
+def convert_to_webp(source_path: str, original_filename: str, output_dir: str,
+                    widths: Iterable[int] = IMAGE_VARIANT_WIDTHS,
+                    profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    将图片文件按编码档位转换为WebP或AVIF格式（GIF 动图转换为 WebP 动图）并写入 output_dir，在进程池中执行
+    :param profile: 编码参数（get_profile 的结果），为 None 时使用默认档位
+    长边超过 IMAGE_MAX_EDGE 的图片先等比缩小；同时为小于原图宽度的每个 widths 生成缩小版本
+    输出文件按编码结果的哈希命名，已存在相同文件时不重复写入
+    直接从文件解码、编码结果直接写入文件，不在进程间传递图片数据
+    :return: {filename, original_size, compressed_size, compression_ratio, width, height,
+              variants: {宽度: 文件名}, color, placeholder}
+    """
+    original_size = os.path.getsize(source_path)
+    profile = profile or get_profile()
+    extension = f".{profile['format']}"
+
+    # GIF 动图转换为 WebP 动图；不能转换或转换后更大时保留原 GIF（静态 GIF 按普通图片转换）
+    if get_file_extension(original_filename) == '.gif' and is_animated(source_path):
+        return convert_animated_gif(source_path, output_dir, original_size) or store_original(
+            source_path, output_dir, original_size, '.gif'
+        )
+
+    # 打开图片（长边超过 IMAGE_MAX_EDGE 时解码时即缩小）
+    image = open_image(source_path)
+
+    # 编码：先写临时文件，按编码结果的哈希命名；相同文件已存在时丢弃临时文件
+    tmp_path = os.path.join(output_dir, f".{uuid.uuid4().hex}{extension}.tmp")
+    try:
+        _save_image(image, tmp_path, profile)
+        new_filename = content_filename(file_digest(tmp_path), extension)
+        output_path = os.path.join(output_dir, new_filename)
+        if os.path.exists(output_path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    # 缩小版本（按比例缩放，不放大；已存在的不重复生成）
+    variants = {}
+    for width in sorted(set(widths)):
+        if width >= image.width:
+            continue
+        variant_name = variant_filename(new_filename, width)
+        variant_path = os.path.join(output_dir, variant_name)
+        if not os.path.exists(variant_path):
+            height = max(1, round(image.height * width / image.width))
+            _save_atomic(image.resize((width, height), Image.Resampling.LANCZOS), variant_path, profile)
+        variants[width] = variant_name
+
+    # 获取原始和压缩后的大小
+    compressed_size = os.path.getsize(output_path)
+    compression_ratio = (1 - compressed_size / original_size) * 100
+
+    return {
+        'filename': new_filename,
+        'original_size': original_size,
+        'compressed_size': compressed_size,
+        'compression_ratio': compression_ratio,
+        'width': image.width,
+        'height': image.height,
+        'variants': variants,
+        **image_preview(image),
+    }
+
+def convert_animated_gif(source_path: str, output_dir: str, original_size: int) -> Optional[Dict[str, Any]]:
+    """
+    GIF 动图转换为 WebP 动图，保留每帧时长和循环次数，不生成缩小版本
+    帧数超过 IMAGE_GIF_MAX_FRAMES 或长边超过 IMAGE_GIF_MAX_EDGE 时不转换（限制编码耗时和内存）
+    逐帧解码编码，不同时保留所有帧
+    :return: 与 convert_to_webp 相同的结果；不转换或 WebP 不比原 GIF 小时返回 None
+    """
+    with Image.open(source_path) as image:
+        if image.n_frames > IMAGE_GIF_MAX_FRAMES or max(image.size) > IMAGE_GIF_MAX_EDGE:
+            return None
+
+        durations = []
+        for index in range(image.n_frames):
+            image.seek(index)
+            duration = image.info.get('duration') or 0
+            durations.append(duration if duration > GIF_MIN_FRAME_DURATION else GIF_DEFAULT_FRAME_DURATION)
+        image.seek(0)
+        # GIF 没有循环扩展时只播放一次；有时 0 表示无限循环，与 WebP 一致
+        loop = image.info.get('loop', 1)
+        width, height = image.size
+        preview = image_preview(image.convert('RGBA'))
+
+        tmp_path = os.path.join(output_dir, f".{uuid.uuid4().hex}.webp.tmp")
+        try:
+            image.save(
+                tmp_path,
+                format='WEBP',
+                save_all=True,
+                duration=durations,
+                loop=loop,
+                quality=WEBP_QUALITY,
+                method=ANIMATED_WEBP_METHOD
+            )
+            compressed_size = os.path.getsize(tmp_path)
+            if compressed_size >= original_size:
+                return None
+            new_filename = content_filename(file_digest(tmp_path), '.webp')
+            output_path = os.path.join(output_dir, new_filename)
+            if not os.path.exists(output_path):
+                os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    return {
+        'filename': new_filename,
+        'original_size': original_size,
+        'compressed_size': compressed_size,
+        'compression_ratio': (1 - compressed_size / original_size) * 100,
+        'width': width,
+        'height': height,
+        'variants': {},
+        **preview,
+    }
+
+def store_original(source_path: str, output_dir: str, original_size: int, extension: str) -> Dict[str, Any]:
+    """原样保存，不转换（内容不变，按原文件哈希命名）"""
+    new_filename = content_filename(file_digest(source_path), extension)
+    output_path = os.path.join(output_dir, new_filename)
+    if not os.path.exists(output_path):
+        tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, output_path)
+    with Image.open(source_path) as image:
+        width, height = image.size
+        preview = image_preview(image.convert('RGBA'))
+    return {
+        'filename': new_filename,
+        'original_size': original_size,
+        'compressed_size': original_size,
+        'compression_ratio': 0.0,
+        'width': width,
+        'height': height,
+        'variants': {},
+        **preview,
+    }
+
+def resize_to_webp(source_path: str, output_path: str, width: Optional[int], quality: int) -> int:
+    """
+    将图片缩小到指定宽度（不放大）并以指定质量编码为WebP，在进程池中执行
+    WebP 动图不缩放，原样复制（逐帧缩放会丢失动画）
+    :return: 输出文件大小
+    """
+    if is_animated(source_path):
+        tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, output_path)
+        return os.path.getsize(output_path)
+
+    image = open_image(source_path, max_edge=None)
+
+    if width is not None and width < image.width:
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.Resampling.LANCZOS)
+
+    _save_atomic(image, output_path, {'format': 'webp', 'quality': quality, 'method': RESIZE_WEBP_METHOD})
+    return os.path.getsize(output_path)
+
+def _save_atomic(image: Image.Image, path: str, profile: Dict[str, Any]):
+    """按编码参数保存（先写临时文件再替换，并发读取不会读到写了一半的文件）"""
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        _save_image(image, tmp_path, profile)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _save_image(image: Image.Image, path: str, profile: Dict[str, Any]):
+    """
+    按编码参数保存为WebP或AVIF
+    WebP：quality（0-100）、method（0-6，6最慢但压缩最好）
+    AVIF：quality（0-100）、speed（0-10，0最慢但压缩最好）
+    """
+    if profile['format'] == 'avif':
+        image.save(path, format='AVIF', quality=profile['quality'], speed=profile.get('speed', 6))
+    else:
+        image.save(path, format='WEBP', quality=profile['quality'], method=profile.get('method', 6))
+
+class ImagePool:
+    """图片处理进程池（首次使用时创建），限制排队（含执行中）的任务数"""
+
+    def __init__(self, workers: int, queue_depth: int):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.pending = 0
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        """获取进程池"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def run(self, func, *args):
+        """
+        在进程池中执行图片处理函数
+        排队（含执行中）的任务数达到 queue_depth 时抛出 ImageQueueFullError
+        """
+        if self.pending >= self.queue_depth:
+            raise ImageQueueFullError("图片处理任务过多，请稍后再试")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.get_executor(), func, *args)
+        finally:
+            self.pending -= 1
+
+# 上传转换和按需缩放各用一个进程池，匿名的缩放请求不会挤占上传
+upload_pool = ImagePool(IMAGE_WORKERS, IMAGE_QUEUE_DEPTH)
+resize_pool = ImagePool(IMAGE_RESIZE_WORKERS, IMAGE_RESIZE_QUEUE_DEPTH)
+
+async def run_in_pool(func, *args):
+    """在上传进程池中执行图片处理函数（排队已满时抛出 ImageQueueFullError）"""
+    return await upload_pool.run(func, *args)
+
+async def convert_to_webp_async(source_path: str, original_filename: str, output_dir: str,
+                               profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """在进程池中转换图片，不阻塞事件循环"""
+    return await run_in_pool(convert_to_webp, source_path, original_filename, output_dir, IMAGE_VARIANT_WIDTHS, profile)
@@ -0,0 +1,126 @@
+"""
+按需缩放图片（/media/images/{name}?w=&q=）
+- 宽度和质量只允许白名单中的取值，避免任意参数撑爆缓存
+- 首次请求时在单独的缩放进程池中编码（不占用上传的进程和排队名额），结果缓存到磁盘，按 LRU 淘汰，总大小不超过 IMAGE_RESIZE_CACHE_BYTES
+- 同一版本的并发请求共享一次编码
+"""
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+from backend.config import IMAGE_RESIZE_CACHE_BYTES
+from backend.services.image_processing import resize_pool, resize_to_webp
+from backend.utils.file_storage import ADMIN_DATA_DIR
+
+# 缩放结果缓存目录
+RESIZE_CACHE_DIR = ADMIN_DATA_DIR / "image_cache"
+
+class ResizeCache:
+    """缩放结果的磁盘缓存"""
+
+    def __init__(self, cache_dir: Path = RESIZE_CACHE_DIR, max_bytes: int = IMAGE_RESIZE_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.loaded = False
+        self.lock = threading.Lock()
+        # 缓存文件名 -> 大小，按最近使用排序
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        # 正在编码的版本：缓存文件名 -> Future（单飞）
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        """首次使用时扫描缓存目录，按修改时间恢复 LRU 顺序"""
+        if self.loaded:
+            return
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        files = []
+        for path in self.cache_dir.glob('*.webp'):
+            stat = path.stat()
+            files.append((stat.st_mtime, path.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._bytes += size
+        self.loaded = True
+        self._evict()
+
+    def _touch(self, name: str):
+        """命中时移到队尾，并更新修改时间以便重启后保持顺序"""
+        self._entries.move_to_end(name)
+        try:
+            os.utime(self.cache_dir / name)
+        except FileNotFoundError:
+            pass
+
+    def _add(self, name: str, size: int):
+        """记录新的缓存文件并按预算淘汰"""
+        old = self._entries.pop(name, None)
+        if old is not None:
+            self._bytes -= old
+        self._entries[name] = size
+        self._bytes += size
+        self._evict()
+
+    def _evict(self):
+        """淘汰最久未使用的文件，直到总大小不超过预算（刚写入的文件保留，以便本次返回）"""
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            (self.cache_dir / name).unlink(missing_ok=True)
+
+    async def get(self, source: Path, width: Optional[int], quality: int) -> Path:
+        """
+        获取缩放后的文件路径（缓存未命中时编码）
+        原图比缓存新时重新编码
+        """
+        name = f"{source.stem}_w{width or 0}_q{quality}.webp"
+        path = self.cache_dir / name
+        with self.lock:
+            self._load()
+            if name in self._entries:
+                try:
+                    if path.stat().st_mtime_ns >= source.stat().st_mtime_ns:
+                        self._touch(name)
+                        self.hits += 1
+                        return path
+                except FileNotFoundError:
+                    pass
+            self.misses += 1
+
+        future = self._inflight.get(name)
+        if future is not None:
+            await asyncio.shield(future)
+            return path
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[name] = future
+        try:
+            size = await resize_pool.run(resize_to_webp, str(source), str(path), width, quality)
+            with self.lock:
+                self._add(name, size)
+            future.set_result(None)
+        except BaseException as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(name, None)
+        return path
+
+    def stats(self) -> Dict[str, int]:
+        """缓存统计"""
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+# 进程级缓存实例
+resize_cache = ResizeCache()
@@ -0,0 +1,74 @@
+"""
+上传图片的转换和登记（同步上传接口和后台任务队列共用）
+- 同一张图片（原文件哈希和编码参数相同）再次上传时直接复用之前的结果，不重新编码
+- 宽高、主色调和占位图记录到图片元数据索引（按输出文件名）
+"""
+from pathlib import Path
+from typing import Any, Dict
+from backend.services.image_index import image_index
+from backend.services.image_processing import convert_to_webp_async, get_file_extension, input_key
+from backend.utils.file_storage import ADMIN_DATA_DIR
+
+# 上传图片目录
+IMAGES_DIR = ADMIN_DATA_DIR / "images"
+
+# 记录到图片元数据索引中的字段（公开接口返回给页面占位用）
+IMAGE_META_FIELDS = ('width', 'height', 'color', 'placeholder')
+
+def stored_files_exist(result: Dict[str, Any]) -> bool:
+    """转换结果中的文件（含缩小版本）是否都还在磁盘上"""
+    names = [result['filename'], *result['variants'].values()]
+    return all((IMAGES_DIR / name).exists() for name in names)
+
+async def convert_saved_upload(source_path: Path, digest: str, original_filename: str,
+                               profile: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    在进程池中按编码档位转换已保存的上传文件，结果直接写入图片目录
+    :param digest: 上传原文件的 SHA-256
+    :return: image_processing.convert_to_webp 的结果，另加 deduplicated 字段
+    :raises ImageQueueFullError: 进程池排队已满
+    """
+    key = input_key(digest, original_filename, profile)
+    cached = image_index.lookup_input(key)
+    if cached is not None and stored_files_exist(cached):
+        image_index.add_file(cached['filename'])
+        return {**cached, **(image_index.get_meta(cached['filename']) or {}), 'deduplicated': True}
+
+    result = await convert_to_webp_async(str(source_path), original_filename, str(IMAGES_DIR), profile)
+    # JSON 的键只能是字符串，宽度统一转为字符串保存
+    result['variants'] = {str(width): name for width, name in result['variants'].items()}
+    # 占位图只保存在元数据索引中
+    image_index.record_upload(
+        key,
+        {k: v for k, v in result.items() if k not in ('color', 'placeholder')},
+        {field: result[field] for field in IMAGE_META_FIELDS}
+    )
+    return {**result, 'deduplicated': False}
+
+def build_upload_result(result: Dict[str, Any], original_filename: str) -> Dict[str, Any]:
+    """
+    生成单张图片的上传结果
+    variants 为 宽度 -> URL（含原图），srcset 可直接用于 <img srcset>
+    color、placeholder 为主色调和内联占位图
+    """
+    url = f"/media/images/{result['filename']}"
+    variants = {int(width): f"/media/images/{name}" for width, name in result['variants'].items()}
+    variants[result['width']] = url
+    variants = dict(sorted(variants.items()))
+
+    return {
+        "url": url,
+        "filename": result['filename'],
+        "original_filename": original_filename,
+        "original_size": result['original_size'],
+        "compressed_size": result['compressed_size'],
+        "compression_ratio": f"{result['compression_ratio']:.1f}%",
+        "format": get_file_extension(result['filename'])[1:],
+        "width": result['width'],
+        "height": result['height'],
+        "variants": {str(width): variant_url for width, variant_url in variants.items()},
+        "srcset": ", ".join(f"{variant_url} {width}w" for width, variant_url in variants.items()),
+        "color": result.get('color'),
+        "placeholder": result.get('placeholder'),
+        "deduplicated": result['deduplicated']
+    }
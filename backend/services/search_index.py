@@ -0,0 +1,359 @@
+"""
+全文搜索倒排索引
+- 中文（CJK）按字符二元组（bigram）切分，单字片段保留为单字
+- 拉丁文字和数字按单词切分，查询时按前缀匹配；查询词不少于 SUBSTRING_MIN_LENGTH 个字符时
+  也匹配词中间出现的位置（如 script 匹配 javascript），在词表上查找
+- 索引持久化到 admin_data/search_index.json，正文变化时按文章增量更新
+- 按 BM25（标题字段加权）打分，用堆取前 k 条
+"""
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from bisect import bisect_left
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Set, Tuple
+from backend.utils.file_storage import ADMIN_DATA_DIR, ContentStorage, file_signature
+
+# 索引文件路径
+INDEX_FILE = ADMIN_DATA_DIR / "search_index.json"
+
+# 索引格式版本（格式变化时丢弃旧索引重建）
+INDEX_VERSION = 2
+
+# BM25 参数（标题很短，长度归一化力度小于正文）
+BM25_K1 = 1.2
+BM25_B_TITLE = 0.5
+BM25_B_CONTENT = 0.75
+# 标题字段的权重（相对正文，与原先标题 10 / 正文 1 的相关度权重一致）
+TITLE_BOOST = 10.0
+
+# 拉丁查询词达到该长度时，除前缀外也匹配词中间出现的位置（更短的查询在词表中命中过多）
+SUBSTRING_MIN_LENGTH = 3
+
+# 查询没有可索引词项时，逐篇子串匹配最多检查的文章数（从最新的开始）
+SCAN_MAX_DOCS = 2000
+
+# 参与搜索的内容类型
+SEARCH_TYPES = ['research', 'media', 'activity', 'shop']
+
+# 拉丁单词/数字 或 连续的 CJK 字符
+_TOKEN_RE = re.compile(r'[a-z0-9]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+
+def _is_cjk(run: str) -> bool:
+    """判断切出的片段是否为 CJK 字符"""
+    return not ('a' <= run[0] <= 'z' or '0' <= run[0] <= '9')
+
+def tokenize(text: str) -> List[str]:
+    """
+    将文本切分为索引词项（文本需已转小写）
+    CJK 片段同时产生单字和二元组，单字用于单字查询
+    """
+    tokens = []
+    for run in _TOKEN_RE.findall(text):
+        if not _is_cjk(run):
+            tokens.append(run)
+            continue
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+def tokenize_query(keyword: str) -> List[Tuple[str, bool]]:
+    """
+    将查询切分为词项
+    :return: [(词项, 是否按前缀匹配)]；CJK 多字片段只用二元组，单字片段用单字
+    """
+    terms = []
+    for run in _TOKEN_RE.findall(keyword):
+        if not _is_cjk(run):
+            terms.append((run, True))
+        elif len(run) == 1:
+            terms.append((run, False))
+        else:
+            terms.extend((run[i:i + 2], False) for i in range(len(run) - 1))
+    return terms
+
+def _fingerprint(title: str, content: str) -> str:
+    """文章文本指纹，用于判断是否需要重新索引"""
+    return hashlib.sha1(f"{title}\0{content}".encode('utf-8')).hexdigest()[:16]
+
+class SearchIndex:
+    """倒排索引：词项 -> {文档键: [标题词频, 正文词频]}"""
+
+    def __init__(self, index_file: Path = INDEX_FILE):
+        self.index_file = index_file
+        self.lock = threading.RLock()
+        self.loaded = False
+        # content_type -> 建立索引时正文文件的签名
+        self.files: Dict[str, Optional[List[int]]] = {}
+        # 文档键 "type:id" -> {type, id, fp, title_len, content_len, terms}
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.postings: Dict[str, Dict[str, List[int]]] = {}
+        # 排序后的词表，用于前缀查找（词表变化后置为 None，按需重建）
+        self._vocabulary: Optional[List[str]] = None
+        # 索引内容每变化一次递增（正文在管理接口之外被修改时，用于使派生缓存失效）
+        self.generation = 0
+        # 各字段总长度，用于计算 BM25 平均字段长度
+        self.total_title_len = 0
+        self.total_content_len = 0
+
+    # ========== 持久化 ==========
+
+    def _load(self):
+        """从磁盘加载索引（格式不符时从空索引开始）"""
+        if self.loaded:
+            return
+        self.loaded = True
+        if not self.index_file.exists():
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"读取搜索索引失败，将重建: {e}")
+            return
+        if data.get('version') != INDEX_VERSION:
+            return
+        self.files = data.get('files', {})
+        self.docs = data.get('docs', {})
+        self.postings = data.get('postings', {})
+        self.total_title_len = sum(d['title_len'] for d in self.docs.values())
+        self.total_content_len = sum(d['content_len'] for d in self.docs.values())
+
+    def _save(self):
+        """写入磁盘（先写临时文件再替换，避免写入中断导致索引损坏）"""
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_file.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': INDEX_VERSION,
+                'files': self.files,
+                'docs': self.docs,
+                'postings': self.postings,
+            }, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.index_file)
+
+    # ========== 增量更新 ==========
+
+    def _add_doc(self, key: str, content_type: str, post: Dict[str, Any], fp: str):
+        """将一篇文章加入索引"""
+        title_tokens = tokenize((post.get('title') or '').lower())
+        content_tokens = tokenize((post.get('content') or '').lower())
+
+        counts: Dict[str, List[int]] = {}
+        for token in title_tokens:
+            counts.setdefault(token, [0, 0])[0] += 1
+        for token in content_tokens:
+            counts.setdefault(token, [0, 0])[1] += 1
+
+        for term, tf in counts.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                self._vocabulary = None
+            postings[key] = tf
+
+        self.docs[key] = {
+            'type': content_type,
+            'id': post.get('id'),
+            'created_at': post.get('created_at') or '',
+            'fp': fp,
+            'title_len': len(title_tokens),
+            'content_len': len(content_tokens),
+            'terms': list(counts),
+        }
+        self.total_title_len += len(title_tokens)
+        self.total_content_len += len(content_tokens)
+
+    def _remove_doc(self, key: str):
+        """将一篇文章移出索引"""
+        doc = self.docs.pop(key, None)
+        if doc is None:
+            return
+        self.total_title_len -= doc['title_len']
+        self.total_content_len -= doc['content_len']
+        for term in doc['terms']:
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(key, None)
+            if not postings:
+                del self.postings[term]
+                self._vocabulary = None
+
+    def sync(self, content_type: str, force: bool = False) -> bool:
+        """
+        使某一内容类型的索引与正文文件一致（只重新索引新增或变化的文章）
+        :return: 索引是否有变化
+        """
+        if content_type not in SEARCH_TYPES:
+            return False
+        with self.lock:
+            self._load()
+            storage = ContentStorage(content_type)
+            signature = file_signature(storage.file_path)
+            stored = self.files.get(content_type)
+            if not force and stored is not None and signature is not None and tuple(stored) == signature:
+                return False
+
+            posts = {
+                f"{content_type}:{p.get('id')}": p
+                for p in storage.get_all()
+                if p.get('status') == 'published'
+            }
+            changed = False
+
+            # 删除已不存在的文章
+            prefix = f"{content_type}:"
+            for key in [k for k in self.docs if k.startswith(prefix) and k not in posts]:
+                self._remove_doc(key)
+                changed = True
+
+            # 新增或变化的文章重新索引
+            for key, post in posts.items():
+                fp = _fingerprint(post.get('title') or '', post.get('content') or '')
+                doc = self.docs.get(key)
+                if doc is not None and doc['fp'] == fp:
+                    continue
+                self._remove_doc(key)
+                self._add_doc(key, content_type, post, fp)
+                changed = True
+
+            self.files[content_type] = list(signature) if signature else None
+            # 只有文章增删改时才重写索引文件；仅签名变化时下次启动重新比对一次即可
+            if changed:
+                self.generation += 1
+                self._save()
+            return changed
+
+    def ensure_fresh(self):
+        """查询前检查所有正文文件签名，有变化的类型增量同步"""
+        for content_type in SEARCH_TYPES:
+            self.sync(content_type)
+
+    # ========== 查询 ==========
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        """返回以 prefix 开头的所有词项"""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        vocabulary = self._vocabulary
+        start = bisect_left(vocabulary, prefix)
+        end = start
+        while end < len(vocabulary) and vocabulary[end].startswith(prefix):
+            end += 1
+        return vocabulary[start:end]
+
+    def _expand_latin(self, term: str) -> List[str]:
+        """拉丁查询词：前缀匹配的词项，词长足够时加上在词中间包含它的词项"""
+        terms = self._expand_prefix(term)
+        if len(term) >= SUBSTRING_MIN_LENGTH:
+            terms += [t for t in self._vocabulary if term in t and not t.startswith(term)]
+        return terms
+
+    def search(self, keyword: str, limit: int, offset: int = 0) -> Tuple[int, List[Tuple[float, str]]]:
+        """
+        查询并按 BM25 打分
+        文档需包含查询的全部词项（前缀词项匹配任一展开词即可）
+        :return: (匹配总数, 第 offset 条起的 limit 条 [(得分, 文档键)])
+        """
+        terms = tokenize_query(keyword)
+        if not terms:
+            # 没有可索引的词项（如假名、韩文、符号），退回逐篇子串匹配
+            return self._scan(keyword, limit, offset)
+        with self.lock:
+            total_docs = len(self.docs)
+            if total_docs == 0:
+                return 0, []
+            avg_title_len = self.total_title_len / total_docs or 1.0
+            avg_content_len = self.total_content_len / total_docs or 1.0
+
+            # 每个查询词项：展开后的 [(词项, 倒排表)]
+            expanded = []
+            for term, is_prefix in terms:
+                term_postings = [
+                    (t, self.postings[t])
+                    for t in (self._expand_latin(term) if is_prefix else [term])
+                    if t in self.postings
+                ]
+                if not term_postings:
+                    return 0, []
+                expanded.append(term_postings)
+
+            # 求交集：从文档数最少的词项开始
+            matched: Optional[Set[str]] = None
+            for term_postings in sorted(expanded, key=lambda tp: sum(len(p) for _, p in tp)):
+                docs = set()
+                for _, postings in term_postings:
+                    docs.update(postings)
+                matched = docs if matched is None else matched & docs
+                if not matched:
+                    return 0, []
+
+            scores = dict.fromkeys(matched, 0.0)
+            for term_postings in expanded:
+                # 同一查询词的多个前缀展开词只取得分最高的一个，不重复计分
+                best: Dict[str, float] = {}
+                for _, postings in term_postings:
+                    idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    # 遍历倒排表和匹配集合中较小的一个
+                    if len(postings) < len(matched):
+                        keys = [key for key in postings if key in matched]
+                    else:
+                        keys = [key for key in matched if key in postings]
+                    for key in keys:
+                        tf = postings[key]
+                        doc = self.docs[key]
+                        # BM25F：先按字段长度归一化并加权合并词频，再做饱和
+                        weighted_tf = (
+                            TITLE_BOOST * tf[0] / (1 - BM25_B_TITLE + BM25_B_TITLE * doc['title_len'] / avg_title_len)
+                            + tf[1] / (1 - BM25_B_CONTENT + BM25_B_CONTENT * doc['content_len'] / avg_content_len)
+                        )
+                        score = idf * weighted_tf / (BM25_K1 + weighted_tf)
+                        if score > best.get(key, 0.0):
+                            best[key] = score
+                for key, score in best.items():
+                    scores[key] += score
+
+            # 只取需要的前 offset + limit 条（堆选择，无需全量排序）；同分时较新的在前
+            top = heapq.nlargest(
+                offset + limit,
+                scores.items(),
+                key=lambda item: (item[1], self.docs[item[0]]['created_at'])
+            )
+            return len(scores), [(score, key) for key, score in top[offset:]]
+
+    def _scan(self, keyword: str, limit: int, offset: int) -> Tuple[int, List[Tuple[float, str]]]:
+        """
+        对最近的 SCAN_MAX_DOCS 篇文章逐篇做子串匹配（查询没有可索引词项时使用，结果由搜索路由缓存）
+        得分沿用原先的规则：标题命中 10 分，正文命中 1 分
+        """
+        with self.lock:
+            recent = heapq.nlargest(SCAN_MAX_DOCS, self.docs.items(), key=lambda item: item[1]['created_at'])
+            candidates = [(key, doc['type'], doc['id'], doc['created_at']) for key, doc in recent]
+        storages = {t: ContentStorage(t) for t in SEARCH_TYPES}
+        scored: List[Tuple[float, str, str]] = []
+        for key, content_type, post_id, created_at in candidates:
+            post = storages[content_type].get_by_id(post_id)
+            if post is None:
+                continue
+            score = 0.0
+            if keyword in (post.get('title') or '').lower():
+                score += TITLE_BOOST
+            if keyword in (post.get('content') or '').lower():
+                score += 1.0
+            if score:
+                scored.append((score, created_at, key))
+        # 同分时较新的在前
+        top = heapq.nlargest(offset + limit, scored)
+        return len(scored), [(score, key) for score, _, key in top[offset:]]
+
+    def doc(self, key: str) -> Optional[Dict[str, Any]]:
+        """获取文档元信息"""
+        return self.docs.get(key)
+
+# 进程级索引实例
+search_index = SearchIndex()
@@ -3,8 +3,9 @@
 用于读写 JSON 数据文件
 """
 import json
+import threading
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import uuid
 from datetime import datetime
 
@@ -12,6 +13,44 @@ from datetime import datetime
 ADMIN_DATA_DIR = Path(__file__).parent.parent.parent / "admin_data"
 USER_DATA_DIR = Path(__file__).parent.parent.parent / "user_data"
 
+# 进程级正文缓存：content_type -> (文件签名, 解析后的数据, id -> 文章 索引)
+# 文件签名为 (st_mtime_ns, st_size, st_ino)，文件未变化时读取只需一次 stat + 字典查找
+_content_cache: Dict[str, Tuple[Tuple[int, int, int], Dict[str, Any], Dict[str, Dict[str, Any]]]] = {}
+_content_cache_lock = threading.Lock()
+
+# 全局正文版本号：任意类型的正文被管理接口改写时递增，供派生缓存（如搜索结果）判断失效
+_content_version = 0
+
+def file_signature(file_path: Path) -> Optional[Tuple[int, int, int]]:
+    """获取文件签名（文件不存在时返回 None）"""
+    try:
+        stat = file_path.stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+def get_content_version() -> int:
+    """获取全局正文版本号"""
+    return _content_version
+
+def bump_content_version() -> int:
+    """递增全局正文版本号"""
+    global _content_version
+    with _content_cache_lock:
+        _content_version += 1
+        return _content_version
+
+def invalidate_content_cache(content_type: Optional[str] = None):
+    """
+    使正文缓存失效
+    :param content_type: 内容类型，为 None 时清空全部缓存
+    """
+    with _content_cache_lock:
+        if content_type is None:
+            _content_cache.clear()
+        else:
+            _content_cache.pop(content_type, None)
+
 class ContentStorage:
     """内容存储管理器（正文内容存储）"""
     
@@ -23,7 +62,9 @@ class ContentStorage:
         self.content_type = content_type
         # 正文文件存储在 published/ 目录
         self.file_path = ADMIN_DATA_DIR / "published" / f"{content_type}.json"
-        self._ensure_file_exists()
+        # 已缓存说明文件存在，无需再次检查
+        if content_type not in _content_cache:
+            self._ensure_file_exists()
     
     def _ensure_file_exists(self):
         """确保数据文件和目录存在"""
@@ -41,19 +82,37 @@ class ContentStorage:
         """保存数据文件"""
         with open(self.file_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
+        invalidate_content_cache(self.content_type)
     
-    def get_all(self) -> List[Dict[str, Any]]:
-        """获取所有内容"""
+    def _load_cached(self) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+        """
+        从进程级缓存加载数据和 id 索引（只读）
+        文件签名变化时重新解析；返回的数据为共享对象，调用方不得修改
+        """
+        signature = file_signature(self.file_path)
+        cached = _content_cache.get(self.content_type)
+        if cached is not None and signature is not None and cached[0] == signature:
+            return cached[1], cached[2]
+        
+        if signature is None:
+            self._ensure_file_exists()
+            signature = file_signature(self.file_path)
+        
         data = self._load_data()
+        index = {post.get('id'): post for post in data.get('posts', [])}
+        with _content_cache_lock:
+            _content_cache[self.content_type] = (signature, data, index)
+        return data, index
+    
+    def get_all(self) -> List[Dict[str, Any]]:
+        """获取所有内容（只读，来自缓存）"""
+        data, _ = self._load_cached()
         return data.get('posts', [])
     
     def get_by_id(self, post_id: str) -> Optional[Dict[str, Any]]:
-        """根据ID获取内容"""
-        posts = self.get_all()
-        for post in posts:
-            if post.get('id') == post_id:
-                return post
-        return None
+        """根据ID获取内容（只读，通过 id 索引 O(1) 查找）"""
+        _, index = self._load_cached()
+        return index.get(post_id)
     
     def create(self, content: Dict[str, Any]) -> Dict[str, Any]:
         """创建新内容"""
@@ -110,54 +169,3 @@ class ContentStorage:
             return True
         
         return False
-
-
-class ChatStorage:
-    """聊天消息存储管理器"""
-    
-    def __init__(self):
-        self.file_path = USER_DATA_DIR / "chat_messages.json"
-        self._ensure_file_exists()
-    
-    def _ensure_file_exists(self):
-        """确保数据文件存在"""
-        if not self.file_path.exists():
-            self._save_data({"messages": []})
-    
-    def _load_data(self) -> Dict[str, Any]:
-        """加载数据文件"""
-        with open(self.file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    
-    def _save_data(self, data: Dict[str, Any]):
-        """保存数据文件"""
-        with open(self.file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-    
-    def get_recent(self, limit: int = 100) -> List[Dict[str, Any]]:
-        """获取最近的聊天消息"""
-        data = self._load_data()
-        messages = data.get('messages', [])
-        return messages[-limit:] if len(messages) > limit else messages
-    
-    def add_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
-        """添加聊天消息"""
-        data = self._load_data()
-        messages = data.get('messages', [])
-        
-        new_message = {
-            'id': str(uuid.uuid4()),
-            'timestamp': datetime.utcnow().isoformat(),
-            **message
-        }
-        
-        messages.append(new_message)
-        
-        # 只保留最近500条消息
-        if len(messages) > 500:
-            messages = messages[-500:]
-        
-        data['messages'] = messages
-        self._save_data(data)
-        
-        return new_message
@@ -0,0 +1,53 @@
+"""
+HTTP 条件请求工具
+为只读接口生成 ETag / Last-Modified，并处理 If-None-Match / If-Modified-Since
+"""
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+from fastapi import Request, Response
+
+def make_etag(*parts) -> str:
+    """根据版本信息（文件签名、内容哈希等）生成强 ETag"""
+    digest = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+    return f'"{digest}"'
+
+def cache_headers(etag: str, last_modified: Optional[float] = None) -> Dict[str, str]:
+    """
+    生成缓存相关响应头
+    no-cache 表示浏览器可以缓存，但每次使用前都要带条件请求向服务器确认
+    """
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    return headers
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[float] = None) -> bool:
+    """
+    判断客户端缓存是否仍然有效
+    If-None-Match 优先；没有时才使用 If-Modified-Since（精确到秒）
+    """
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        if if_none_match.strip() == '*':
+            return True
+        # 比较时忽略弱校验前缀 W/
+        candidates = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+        return etag in candidates
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= since
+
+    return False
+
+def not_modified_response(etag: str, last_modified: Optional[float] = None) -> Response:
+    """返回 304 Not Modified（不带响应体）"""
+    return Response(status_code=304, headers=cache_headers(etag, last_modified))
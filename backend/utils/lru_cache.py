@@ -0,0 +1,76 @@
+"""
+有界 LRU 缓存
+同时限制条目数和总字节数，并记录命中/未命中次数
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+class LRUCache:
+    """按最近使用淘汰的字节缓存（值为 bytes）"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # 缓存对应的数据版本，版本变化时整体失效
+        self._version: Any = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, version: Any = None) -> Optional[bytes]:
+        """读取缓存；version 与写入时不同则清空缓存并视为未命中"""
+        with self._lock:
+            if version != self._version:
+                self._clear_locked()
+                self._version = version
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: bytes, version: Any = None):
+        """写入缓存；超过单条上限的值不缓存"""
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if version != self._version:
+                self._clear_locked()
+                self._version = version
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._data[key] = value
+            self._bytes += len(value)
+            # 淘汰最久未使用的条目，直到满足条目数和字节数限制
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._clear_locked()
+
+    def _clear_locked(self):
+        self._data.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0
+            }
@@ -0,0 +1,91 @@
+"""
+按客户端 IP 的令牌桶限流
+每个接口一个限流器，速率和突发量在 config.RATE_LIMITS 中配置；
+超过限制时在进入处理函数（读写文件）之前直接返回 429
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Tuple
+from fastapi import HTTPException, Request
+from backend.config import RATE_LIMITS, RATE_LIMIT_MAX_CLIENTS, TRUSTED_PROXIES
+
+class TokenBucketLimiter:
+    """令牌桶：以 rate 个/秒补充令牌，最多积攒 burst 个，每个请求消耗一个"""
+
+    def __init__(self, rate: float, burst: int, max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        # 令牌补满所需时间：空闲超过该时间的桶与新桶等价，可以直接丢弃
+        self.idle_seconds = burst / rate
+        # 客户端 -> [剩余令牌, 上次更新时间]，按最近访问排序
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, client: str) -> Tuple[bool, float]:
+        """
+        尝试消耗一个令牌
+        :return: (是否允许, 需要等待的秒数)
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = [float(self.burst), now]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                self._buckets.move_to_end(client)
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True, 0.0
+            return False, (1 - bucket[0]) / self.rate
+
+    def _evict(self, now: float):
+        """惰性淘汰：每次访问时顺带移除已补满的桶；客户端数超过上限时移除最久未访问的"""
+        while self._buckets:
+            client, (_, updated) = next(iter(self._buckets.items()))
+            if now - updated < self.idle_seconds and len(self._buckets) < self.max_clients:
+                break
+            del self._buckets[client]
+
+def client_ip(request: Request) -> str:
+    """
+    获取客户端 IP
+    只有直接来自本机反向代理（Nginx）的请求才采信 X-Real-IP / X-Forwarded-For，避免伪造
+    """
+    peer = request.client.host if request.client else ''
+    if peer not in TRUSTED_PROXIES:
+        return peer
+    real_ip = request.headers.get('x-real-ip')
+    if real_ip:
+        return real_ip.strip()
+    forwarded_for = request.headers.get('x-forwarded-for')
+    if forwarded_for:
+        # 最右侧的地址由 Nginx 追加，不可伪造
+        return forwarded_for.split(',')[-1].strip()
+    return peer
+
+def rate_limit(name: str) -> Callable:
+    """
+    生成限流依赖，用法：@router.post(..., dependencies=[Depends(rate_limit("chat_post"))])
+    :param name: config.RATE_LIMITS 中的配置名
+    """
+    rate, burst = RATE_LIMITS[name]
+    limiter = TokenBucketLimiter(rate, burst)
+
+    async def dependency(request: Request):
+        allowed, retry_after = limiter.acquire(client_ip(request))
+        if not allowed:
+            raise HTTPException(
+                status_code=429,
+                detail="请求过于频繁，请稍后再试",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+
+    dependency.limiter = limiter
+    return dependency
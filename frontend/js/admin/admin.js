@@ -442,7 +442,11 @@ class SimpleAdmin {
     }
     
     // ========== 清理图片 ==========
-    async showCleanupPage() {
+    /**
+     * 清理页：未引用图片由图片索引在内存中计算
+     * @param {boolean} verify - 校验模式，先从磁盘和文章文件重建索引
+     */
+    async showCleanupPage(verify = false) {
         const mainHeader = document.querySelector('.main-header');
         const contentList = document.getElementById('content-list');
         
@@ -451,10 +455,10 @@ class SimpleAdmin {
         mainHeader.querySelector('#new-btn').style.display = 'none';
         
         // 显示加载状态
-        contentList.innerHTML = '<div class="empty">正在扫描...</div>';
+        contentList.innerHTML = `<div class="empty">${verify ? '正在校验索引...' : '正在扫描...'}</div>`;
         
         try {
-            const res = await fetch('/api/admin/cleanup/scan', {
+            const res = await fetch(`/api/admin/cleanup/scan${verify ? '?verify=true' : ''}`, {
                 headers: { 'Authorization': `Bearer ${this.token}` }
             });
             
@@ -472,6 +476,16 @@ class SimpleAdmin {
     renderCleanupPage(data) {
         const contentList = document.getElementById('content-list');
         
+        // 校验模式下显示索引与实际情况的差异
+        const drift = data.index_drift;
+        const driftHtml = drift ? `
+                    <div class="post-content">
+                        索引校验：${drift.missing_files.length + drift.stale_files.length + drift.changed_posts.length === 0
+                            ? '一致'
+                            : `补登 ${drift.missing_files.length} 个文件，移除 ${drift.stale_files.length} 个文件，修正 ${drift.changed_posts.length} 篇文章的引用`}
+                    </div>
+        ` : '';
+        
         // 统计信息（复用 post-item）
         const statsHtml = `
             <div class="post-item">
@@ -482,6 +496,10 @@ class SimpleAdmin {
                         被引用：${data.referenced_images} 个 | 
                         未引用图片：${data.unreferenced_count} 个 (${data.total_size_mb} MB)
                     </div>
+                    ${driftHtml}
+                </div>
+                <div class="post-actions">
+                    <a href="#" class="action-link" id="cleanup-verify-btn">校验索引</a>
                 </div>
             </div>
         `;
@@ -489,6 +507,7 @@ class SimpleAdmin {
         // 如果没有未引用图片
         if (data.unreferenced_count === 0) {
             contentList.innerHTML = statsHtml + '<div class="empty">无未引用图片</div>';
+            this.bindCleanupVerify();
             return;
         }
         
@@ -522,6 +541,14 @@ class SimpleAdmin {
             e.preventDefault();
             this.executeCleanup();
         });
+        this.bindCleanupVerify();
+    }
+    
+    bindCleanupVerify() {
+        document.getElementById('cleanup-verify-btn').addEventListener('click', (e) => {
+            e.preventDefault();
+            this.showCleanupPage(true);
+        });
     }
     
     async executeCleanup() {
@@ -3,6 +3,25 @@
  */
 import { HtmlHelpers } from '../utils/htmlHelpers.js';
 
+/**
+ * 图片占位样式：原图加载前先显示主色调和模糊的内联占位图
+ * @param {Object|null} meta - 接口返回的图片元数据 {width, height, color, placeholder}
+ */
+function placeholderStyle(meta) {
+    if (!meta) return '';
+    const layers = [];
+    if (meta.placeholder) layers.push(`url(${meta.placeholder}) center / cover no-repeat`);
+    if (meta.color) layers.push(meta.color);
+    return layers.length ? ` style="background: ${layers.join(', ')};"` : '';
+}
+
+/**
+ * 图片尺寸属性：浏览器据此预留空间，避免加载后布局跳动
+ */
+function sizeAttributes(meta) {
+    return meta && meta.width && meta.height ? ` width="${meta.width}" height="${meta.height}"` : '';
+}
+
 export class ContentCard {
     constructor(post, options = {}) {
         this.post = post;
@@ -92,21 +111,30 @@ export class ContentCard {
 
     /**
      * 渲染简单样式（用于用户端列表页 - 紧凑单行模式）
+     * 支持完整文章和摘要投影（fields=summary，含 excerpt、image、image_srcset 和 image_meta）
      */
     renderSimple() {
         const { post } = this;
         
         // 截断内容为摘要
-        const contentPreview = HtmlHelpers.truncate(post.content, 100);
+        const contentPreview = post.excerpt !== undefined ? post.excerpt : HtmlHelpers.truncate(post.content, 100);
         
         // 获取第一张缩略图
-        const thumbnail = post.images && post.images.length > 0 ? post.images[0] : null;
+        let thumbnail = post.image || null;
+        if (!thumbnail && post.images && post.images.length > 0) {
+            thumbnail = post.images[0];
+        }
+        
+        // 有缩小版本时由浏览器按缩略图尺寸（80px）选择合适的宽度
+        const srcset = post.image_srcset ? ` srcset="${post.image_srcset}" sizes="80px"` : '';
+        // 摘要带首图元数据（宽高、主色调、占位图）
+        const meta = post.image_meta || null;
         
         return `
             <div class="post-list-item">
                 ${thumbnail ? `
-                    <div class="post-thumbnail">
-                        <img src="${thumbnail}" alt="缩略图">
+                    <div class="post-thumbnail"${placeholderStyle(meta)}>
+                        <img src="${thumbnail}"${srcset}${sizeAttributes(meta)} alt="缩略图">
                     </div>
                 ` : ''}
                 <div class="post-list-content">
@@ -159,6 +187,8 @@ export class ContentCard {
         // 预览模式只显示前4张图片
         const imagesToShow = isPreview ? post.images.slice(0, 4) : post.images;
         const imageCount = imagesToShow.length;
+        // 完整文章带 include=image_meta 时有每张图片的元数据
+        const imagesMeta = post.image_meta || {};
         
         // 根据图片数量选择网格类型
         let gridClass = 'grid-4';
@@ -169,8 +199,9 @@ export class ContentCard {
         return `
             <div class="post-images-grid ${gridClass}">
                 ${imagesToShow.map((img, index) => `
-                    <div class="post-image-item">
-                        <img src="${img}" 
+                    <div class="post-image-item"${placeholderStyle(imagesMeta[img])}>
+                        <img src="${img}"${sizeAttributes(imagesMeta[img])}
+                             ${imagesMeta[img] && imagesMeta[img].placeholder ? `data-placeholder="${imagesMeta[img].placeholder}"` : ''}
                              alt="图片 ${index + 1}" 
                              onload="this.style.opacity=1"
                              style="cursor: pointer;"
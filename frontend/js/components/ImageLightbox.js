@@ -30,9 +30,17 @@ export class ImageLightbox {
     /**
      * 打开灯箱显示图片
      * @param {string} imageSrc - 图片URL
+     * @param {Object} meta - 可选的图片元数据 {width, height, placeholder}，用于加载前占位
      */
-    open(imageSrc) {
+    open(imageSrc, meta = {}) {
         const img = this.overlay.querySelector('.lightbox-image');
+        img.removeAttribute('width');
+        img.removeAttribute('height');
+        if (meta.width && meta.height) {
+            img.setAttribute('width', meta.width);
+            img.setAttribute('height', meta.height);
+        }
+        img.style.background = meta.placeholder ? `url(${meta.placeholder}) center / cover no-repeat` : '';
         img.src = imageSrc;
         this.overlay.style.display = 'flex';
         document.body.style.overflow = 'hidden';
@@ -60,7 +68,11 @@ document.addEventListener('DOMContentLoaded', () => {
             if (container) {
                 e.preventDefault();
                 e.stopPropagation();
-                imageLightbox.open(e.target.src);
+                imageLightbox.open(e.target.src, {
+                    width: e.target.getAttribute('width'),
+                    height: e.target.getAttribute('height'),
+                    placeholder: e.target.dataset.placeholder
+                });
             }
         }
     });
@@ -4,6 +4,13 @@
 import { api } from '../utils/apiClient.js';
 import { toast } from './Toast.js';
 
+// 批量上传任务的轮询间隔（毫秒）
+const JOB_POLL_INTERVAL = 1000;
+// 任务进度持续这么久没有变化时停止等待（毫秒）
+const JOB_STALL_TIMEOUT = 60 * 1000;
+// 等待单个任务的总时长上限（毫秒）
+const JOB_MAX_WAIT = 10 * 60 * 1000;
+
 export class ImageUploader {
     constructor(options = {}) {
         this.options = {
@@ -255,9 +262,55 @@ export class ImageUploader {
 
     /**
      * 上传多个文件
+     * 服务器保存文件后立即返回任务 ID，轮询任务直到全部处理完成
+     * @returns {Promise<{uploaded: Array, errors: Array}>}
      */
     async uploadMultiple(formData) {
-        return await api.upload('/upload/images', formData, { auth: true });
+        const response = await api.upload('/upload/images', formData, { auth: true });
+        const errors = [...response.errors];
+        if (!response.job_id) {
+            return { uploaded: [], errors };
+        }
+
+        const job = await this.waitForJob(response.job_id);
+        const uploaded = [];
+        job.items.forEach(item => {
+            if (item.status === 'done') {
+                uploaded.push(item.result);
+            } else {
+                errors.push({ filename: item.filename, error: item.error });
+            }
+        });
+        return { uploaded, errors };
+    }
+
+    /**
+     * 轮询批量上传任务，直到所有图片处理完成
+     * 进度超过 JOB_STALL_TIMEOUT 没有变化、或总等待超过 JOB_MAX_WAIT 时抛出错误
+     */
+    async waitForJob(jobId) {
+        const progressText = this.progressEl.querySelector('.progress-text');
+        const startedAt = Date.now();
+        let lastProgress = -1;
+        let lastProgressAt = startedAt;
+        while (true) {
+            const job = await api.get(`/upload/jobs/${jobId}`, { auth: true });
+            const processed = job.done + job.failed;
+            progressText.textContent = `处理中 ${processed}/${job.total}...`;
+            if (job.status === 'completed') {
+                return job;
+            }
+
+            const now = Date.now();
+            if (processed !== lastProgress) {
+                lastProgress = processed;
+                lastProgressAt = now;
+            }
+            if (now - lastProgressAt > JOB_STALL_TIMEOUT || now - startedAt > JOB_MAX_WAIT) {
+                throw new Error(`图片处理超时（已完成 ${processed}/${job.total}），服务器可能繁忙，请稍后重新上传`);
+            }
+            await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+        }
     }
 
     /**
@@ -343,6 +396,9 @@ export class ImageUploader {
      */
     showProgress(show) {
         this.progressEl.style.display = show ? 'block' : 'none';
+        if (show) {
+            this.progressEl.querySelector('.progress-text').textContent = '上传中...';
+        }
     }
 
     /**
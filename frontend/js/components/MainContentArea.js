@@ -8,11 +8,15 @@ import { EmptyState } from './EmptyState.js';
 import { HtmlHelpers } from '../utils/htmlHelpers.js';
 import { toast } from './Toast.js';
 
+// 列表页每次加载的文章数量
+const PAGE_SIZE = 20;
+
 export class MainContentArea {
     constructor(container, stateManager) {
         this.container = container;
         this.stateManager = stateManager;
         this.posts = [];
+        this.nextCursor = null;
         this.currentPost = null;
         this.currentType = null;
 
@@ -33,6 +37,13 @@ export class MainContentArea {
                 return;
             }
 
+            // 处理加载更多按钮
+            if (e.target.closest('.load-more-btn')) {
+                e.preventDefault();
+                this.loadMore();
+                return;
+            }
+
             // 处理分享按钮点击
             if (e.target.closest('.share-btn')) {
                 e.stopPropagation();
@@ -78,13 +89,15 @@ export class MainContentArea {
     }
 
     /**
-     * 渲染列表页
+     * 渲染列表页（只加载第一页摘要）
      */
     async renderList(type) {
         this.container.innerHTML = EmptyState.loading().render();
 
         try {
-            this.posts = await api.get(`/content/${type}`);
+            const page = await api.get(`/content/${type}?fields=summary&limit=${PAGE_SIZE}`);
+            this.posts = page.items;
+            this.nextCursor = page.next_cursor;
             
             if (this.posts.length === 0) {
                 this.container.innerHTML = new EmptyState({
@@ -97,9 +110,8 @@ export class MainContentArea {
 
             const html = `
                 <div style="padding: var(--content-padding);">
-                    ${this.posts.map(post => {
-                        return `<div data-post-id="${post.id}">${new ContentCard(post).renderSimple()}</div>`;
-                    }).join('')}
+                    <div class="post-list">${this.renderListItems(this.posts)}</div>
+                    ${this.renderLoadMore()}
                 </div>
             `;
             this.container.innerHTML = html;
@@ -109,6 +121,57 @@ export class MainContentArea {
         }
     }
 
+    /**
+     * 加载下一页并追加到列表末尾
+     */
+    async loadMore() {
+        const type = this.currentType;
+        if (!this.nextCursor || !type) return;
+
+        try {
+            const cursor = encodeURIComponent(this.nextCursor);
+            const page = await api.get(`/content/${type}?fields=summary&limit=${PAGE_SIZE}&cursor=${cursor}`);
+            // 请求期间已切换到其他类型，丢弃结果
+            if (type !== this.currentType) return;
+
+            this.posts = this.posts.concat(page.items);
+            this.nextCursor = page.next_cursor;
+
+            const list = this.container.querySelector('.post-list');
+            if (list) {
+                list.insertAdjacentHTML('beforeend', this.renderListItems(page.items));
+            }
+            const loadMore = this.container.querySelector('.load-more');
+            if (loadMore) {
+                loadMore.outerHTML = this.renderLoadMore();
+            }
+        } catch (error) {
+            console.error('加载更多失败:', error);
+            toast.error('加载失败，请重试');
+        }
+    }
+
+    /**
+     * 渲染列表项
+     */
+    renderListItems(posts) {
+        return posts.map(post => {
+            return `<div data-post-id="${post.id}">${new ContentCard(post).renderSimple()}</div>`;
+        }).join('');
+    }
+
+    /**
+     * 渲染加载更多按钮（没有更多时为空）
+     */
+    renderLoadMore() {
+        if (!this.nextCursor) return '';
+        return `
+            <div class="load-more" style="text-align: center; margin-top: var(--section-gap);">
+                <button class="load-more-btn btn btn-sm">加载更多</button>
+            </div>
+        `;
+    }
+
     /**
      * 渲染详情页
      */
@@ -116,15 +179,12 @@ export class MainContentArea {
         this.container.innerHTML = EmptyState.loading().render();
 
         try {
-            // 如果已经加载了列表，直接从中查找
-            if (this.posts.length > 0) {
-                this.currentPost = this.posts.find(p => p.id === itemId);
-            }
-
-            // 如果没找到，重新加载列表
-            if (!this.currentPost) {
-                this.posts = await api.get(`/content/${type}`);
-                this.currentPost = this.posts.find(p => p.id === itemId);
+            // 列表页只有摘要，单独加载这一篇的完整内容（附带图片元数据用于占位）
+            this.currentPost = null;
+            try {
+                this.currentPost = await api.get(`/content/${type}/${encodeURIComponent(itemId)}?include=image_meta`);
+            } catch (error) {
+                console.error('文章不存在:', error);
             }
 
             if (!this.currentPost) {
@@ -6,11 +6,15 @@ import { api } from '../utils/apiClient.js';
 import { ContentCard } from '../components/ContentCard.js';
 import { EmptyState } from '../components/EmptyState.js';
 
+// 每次加载的文章数量
+const PAGE_SIZE = 20;
+
 export class ContentPageBase {
     constructor(config) {
         this.config = config;
         this.container = document.getElementById(config.containerId);
         this.posts = [];
+        this.nextCursor = null;
         
         if (!this.container) {
             console.error(`Container #${config.containerId} not found`);
@@ -21,16 +25,26 @@ export class ContentPageBase {
     }
 
     async init() {
+        // 事件委托：加载更多
+        this.container.addEventListener('click', (e) => {
+            if (e.target.closest('.load-more-btn')) {
+                e.preventDefault();
+                this.loadMore();
+            }
+        });
+
         await this.loadContent();
     }
 
     /**
-     * 加载内容
+     * 加载内容（第一页摘要）
      */
     async loadContent() {
         try {
             this.showLoading();
-            this.posts = await api.get(`/content/${this.config.type}`);
+            const page = await api.get(`/content/${this.config.type}?fields=summary&limit=${PAGE_SIZE}`);
+            this.posts = page.items;
+            this.nextCursor = page.next_cursor;
             this.render();
         } catch (error) {
             console.error('加载内容失败:', error);
@@ -38,6 +52,23 @@ export class ContentPageBase {
         }
     }
 
+    /**
+     * 加载下一页
+     */
+    async loadMore() {
+        if (!this.nextCursor) return;
+
+        try {
+            const cursor = encodeURIComponent(this.nextCursor);
+            const page = await api.get(`/content/${this.config.type}?fields=summary&limit=${PAGE_SIZE}&cursor=${cursor}`);
+            this.posts = this.posts.concat(page.items);
+            this.nextCursor = page.next_cursor;
+            this.render();
+        } catch (error) {
+            console.error('加载更多失败:', error);
+        }
+    }
+
     /**
      * 渲染内容
      */
@@ -51,7 +82,7 @@ export class ContentPageBase {
             .map(post => this.renderPost(post))
             .join('');
         
-        this.container.innerHTML = this.wrapContent(html);
+        this.container.innerHTML = this.wrapContent(html + this.renderLoadMore());
     }
 
     /**
@@ -63,6 +94,18 @@ export class ContentPageBase {
         return card.renderSimple();
     }
 
+    /**
+     * 渲染加载更多按钮（没有更多时为空）
+     */
+    renderLoadMore() {
+        if (!this.nextCursor) return '';
+        return `
+            <div class="load-more" style="text-align: center; margin-top: 20px;">
+                <button class="load-more-btn btn btn-sm">加载更多</button>
+            </div>
+        `;
+    }
+
     /**
      * 包装内容（添加容器）
      */
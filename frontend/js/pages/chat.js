@@ -2,6 +2,8 @@
  * 简化版留言板
  * - 不需要登录
  * - 直接查看和发送留言
+ * - 通过 SSE（/api/chat/stream）接收推送，浏览器不支持或服务器拒绝连接时退回轮询
+ * - 页面隐藏时断开推送连接（不占用服务器连接数），重新可见时再连接
  */
 
 import { toast } from '/js/components/Toast.js';
@@ -13,11 +15,29 @@ class ChatApp {
         this.colorIndex = 1;
         this.maxColors = 6;
         this.pollInterval = null;
+        this.eventSource = null;
+        // 已同步到的消息序号（轮询模式用于增量拉取）
+        this.seq = null;
         
         this.initElements();
         this.bindEvents();
-        this.loadMessages();
-        this.startPolling();
+        
+        if (window.EventSource) {
+            this.connectStream();
+            document.addEventListener('visibilitychange', () => this.onVisibilityChange());
+        } else {
+            this.loadMessages();
+            this.startPolling();
+        }
+    }
+
+    onVisibilityChange() {
+        if (this.pollInterval) return;
+        if (document.hidden) {
+            this.stopStream();
+        } else if (!this.eventSource) {
+            this.connectStream();
+        }
     }
 
     initElements() {
@@ -96,8 +116,10 @@ class ChatApp {
             this.messageInput.value = '';
             this.messageInput.focus();
             
-            // 立即刷新消息列表
-            await this.loadMessages();
+            // 推送模式下新消息会通过 SSE 送达，轮询模式下立即刷新
+            if (!this.eventSource) {
+                await this.loadMessages();
+            }
         } catch (error) {
             console.error('发送消息失败:', error);
             toast.error('发送失败，请重试');
@@ -107,6 +129,7 @@ class ChatApp {
     renderMessage(message) {
         const messageEl = document.createElement('div');
         messageEl.className = 'message';
+        messageEl.dataset.id = message.id;
         
         const time = this.formatTime(message.timestamp);
         const color = this.getUserColor(message.user);
@@ -145,30 +168,117 @@ class ChatApp {
         this.messagesContainer.scrollTop = this.messagesContainer.scrollHeight;
     }
 
+    /**
+     * 拉取消息（轮询模式）
+     * 带上次的 seq 只拉取增量：新消息追加，deleted 中的消息移除，reset 时全量重绘
+     */
     async loadMessages() {
         try {
-            const response = await fetch('/api/chat/messages');
+            const url = this.seq === null ? '/api/chat/messages' : `/api/chat/messages?since=${this.seq}`;
+            const response = await fetch(url);
             const data = await response.json();
             
             const serverMessages = data.messages || [];
+            const deleted = data.deleted || [];
             
-            // 只在消息数量变化时重新渲染
-            if (serverMessages.length !== this.messages.length) {
+            if (this.seq === null || data.reset) {
+                // 首次加载或无法增量同步：清空并重新渲染所有消息
                 this.messages = serverMessages;
-                
-                // 清空并重新渲染所有消息
                 this.messagesContainer.innerHTML = '';
                 this.messages.forEach(msg => {
                     this.renderMessage(msg);
                 });
-                
                 this.scrollToBottom();
+            } else {
+                deleted.forEach(id => this.removeMessage(id));
+                serverMessages.forEach(msg => {
+                    this.messages.push(msg);
+                    this.renderMessage(msg);
+                });
+                if (serverMessages.length > 0) {
+                    this.scrollToBottom();
+                }
             }
+            
+            this.seq = data.seq;
         } catch (e) {
             console.error('加载消息失败:', e);
         }
     }
 
+    removeMessage(id) {
+        this.messages = this.messages.filter(msg => msg.id !== id);
+        const el = this.messagesContainer.querySelector(`[data-id="${CSS.escape(id)}"]`);
+        if (el) el.remove();
+    }
+
+    /**
+     * 连接 SSE 推送通道
+     * init：连接（含自动重连）时的完整消息列表；message：新消息；delete：删除；clear：清空
+     */
+    connectStream() {
+        this.eventSource = new EventSource('/api/chat/stream');
+
+        // init 之后只处理序号更大的事件（init 已包含的变化可能再被推送一次）
+        let lastSeq = 0;
+        const isNew = (seq) => {
+            if (seq === undefined) return true;
+            if (seq <= lastSeq) return false;
+            lastSeq = seq;
+            return true;
+        };
+
+        this.eventSource.addEventListener('init', (e) => {
+            const data = JSON.parse(e.data);
+            lastSeq = data.seq || 0;
+            this.messages = data.messages || [];
+            this.messagesContainer.innerHTML = '';
+            this.messages.forEach(msg => this.renderMessage(msg));
+            this.scrollToBottom();
+        });
+
+        this.eventSource.addEventListener('message', (e) => {
+            const message = JSON.parse(e.data);
+            if (!isNew(message.seq)) return;
+            this.messages.push(message);
+            this.renderMessage(message);
+            this.scrollToBottom();
+        });
+
+        this.eventSource.addEventListener('delete', (e) => {
+            const { id, seq } = JSON.parse(e.data);
+            if (!isNew(seq)) return;
+            this.removeMessage(id);
+        });
+
+        this.eventSource.addEventListener('clear', (e) => {
+            const { seq } = JSON.parse(e.data);
+            if (!isNew(seq)) return;
+            this.messages = [];
+            this.messagesContainer.innerHTML = '';
+        });
+
+        // 断线后 EventSource 会自动重连，重连成功时服务器重新推送 init；
+        // 服务器拒绝连接（如 503 连接数已满）时不会重连，改用轮询
+        this.eventSource.onerror = (e) => {
+            if (this.eventSource && this.eventSource.readyState === EventSource.CLOSED) {
+                console.warn('消息推送不可用，改用轮询');
+                this.stopStream();
+                this.loadMessages();
+                this.startPolling();
+                return;
+            }
+            console.error('消息推送连接中断，正在重连:', e);
+        };
+    }
+
+    stopStream() {
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
+    }
+
     startPolling() {
         // 每3秒自动刷新消息
         this.pollInterval = setInterval(() => {
@@ -188,9 +298,10 @@ class ChatApp {
 document.addEventListener('DOMContentLoaded', () => {
     const app = new ChatApp();
     
-    // 页面卸载时停止轮询
+    // 页面卸载时停止轮询和推送连接
     window.addEventListener('beforeunload', () => {
         app.stopPolling();
+        app.stopStream();
     });
 });
 